@@ -0,0 +1,228 @@
+"""Many boards solved by one breadth-first search from the goal
+
+A search grows layer by layer from the goal and keeps, for every state
+it reached, the direction of the move of the zero element which leads
+one step closer to the goal. A board is answered as soon as the layer
+with it is complete: the moves are read by following the directions, so
+the path is optimal. The layers are kept between the calls, later boards
+with the same goal are answered from the explored region or by growing
+it further.
+
+Goals are relabeled to the sorted tiles with the empty cell in the same
+place (see Solver), so all the goals with the same empty cell share one
+search. The searches of the different empty cells are kept in a LRU
+order and together hold at most ``max_states`` states: a layer which
+does not fit is dropped, the least recently used search of another goal
+is evicted and the layer is made again. When the search of the goal
+itself does not fit, the boards beyond its last layer are not solved.
+"""
+from collections import OrderedDict
+from itertools import islice
+
+from search import DIRECTIONS, canonical_goal, context, pack, parse_state,\
+    solvable, swap
+
+
+class _Tree():
+    """layers of the search from one goal"""
+
+    def __init__(self, goal):
+        self.context = context(goal)
+        side = self.context.side
+        self.steps = (-side, side, -1, 1)
+        # packed configuration -> direction to the goal (None for the goal)
+        self.parents = {self.context.goal_key: None}
+        self.frontier = [(self.context.goal_key, self.context.goal_zero)]
+        self.depth = 0
+
+    def __len__(self):
+        return len(self.parents)
+
+    def grow(self, limit):
+        """add the next layer if the tree does not get larger than limit
+
+        Returns
+        -------
+        int
+            number of the expanded states, 0 if the layer was dropped
+        """
+        context = self.context
+        parents = self.parents
+        layer = []
+        for key, zero in self.frontier:
+            for direction, new_zero, _ in context.moves[zero]:
+                new_key = swap(key, zero, new_zero, context)[0]
+                if new_key not in parents:
+                    # the move back is the opposite direction
+                    parents[new_key] = direction ^ 1
+                    layer.append((new_key, new_zero))
+            if len(parents) > limit:
+                for new_key, _ in layer:
+                    del parents[new_key]
+                return 0
+        expanded = len(self.frontier)
+        self.frontier = layer
+        self.depth += 1
+        return expanded
+
+    def moves(self, key, zero):
+        """moves from a reached configuration to the goal"""
+        context = self.context
+        moves = []
+        direction = self.parents[key]
+        while direction is not None:
+            moves.append(DIRECTIONS[direction])
+            new_zero = zero + self.steps[direction]
+            key = swap(key, zero, new_zero, context)[0]
+            zero = new_zero
+            direction = self.parents[key]
+        return moves
+
+
+class BackwardSearch():
+    """breadth-first searches from the goals shared by the boards
+
+    Arguments
+    ----------
+    max_states : int
+        number of states of all the searches in memory, default 1 000 000
+
+    Attributes
+    ----------
+        expanded : int
+            states expanded by all the searches
+        evictions : int
+            searches dropped to make room for another goal
+    """
+    def __init__(self, max_states=1000000):
+        self.max_states = max_states
+        # canonical goal -> _Tree, the least recently used first
+        self._trees = OrderedDict()
+        self.expanded = self.evictions = 0
+
+    def _tree(self, goal):
+        key = tuple(goal)
+        tree = self._trees.pop(key, None)
+        if tree is None:
+            tree = _Tree(goal)
+        self._trees[key] = tree
+        return tree
+
+    def _grow(self, tree):
+        """add a layer to the tree, evicting the other trees if needed
+
+        Returns
+        -------
+        bool
+            False if the layer does not fit even alone
+        """
+        while True:
+            others = sum(len(t) for t in self._trees.values()
+                         if t is not tree)
+            expanded = tree.grow(self.max_states - others)
+            if expanded:
+                self.expanded += expanded
+                return True
+            if not others:
+                return False
+            self._trees.popitem(last=False)
+            self.evictions += 1
+
+    def solve(self, boards, goal=None, zl=False, window=1000):
+        """optimal moves of every board to the goal
+
+        The boards are read in windows of ``window`` boards and the
+        results of a window are yielded before the next one is read, so
+        the boards may come from a stream.
+
+        Parameters
+        ----------
+        boards : iterable of str or list[int]
+            initial states, a string in format 0,1,2,3 etc
+        goal : list[int], optional
+            goal tiles configuration, by default 0,1,2,... or 1,2,...,0 if
+            zl is True
+        window : int
+            number of the boards read at once, default 1000
+
+        Yields
+        ------
+        dict
+            index of the board, initial state, solved, moves, cost, the
+            depth of the search when the board was answered and reused
+            (the board was in the region explored before its window was
+            read); boards
+            which can not be parsed or solved get an "error" field instead;
+            in every window the boards of the explored region come first,
+            the others in the order of the costs
+        """
+        boards = iter(boards)
+        start = 0
+        while True:
+            parsed = []
+            for index, initial in enumerate(islice(boards, window), start):
+                result = {"index": index, "initial": initial}
+                try:
+                    board = parse_state(initial) if isinstance(initial, str)\
+                        else list(initial)
+                except ValueError as e:
+                    result["error"] = str(e)
+                    board = None
+                parsed.append((result, board))
+            if not parsed:
+                return
+            start += len(parsed)
+            if goal is None:
+                size = next((len(board) for _, board in parsed if board), 0)
+                if size:
+                    goal = list(range(1, size)) + [0] if zl\
+                        else list(range(size))
+            yield from self._solve_window(parsed, goal or [])
+
+    def _solve_window(self, parsed, goal):
+        """results of the parsed boards of one window"""
+        target = canonical_goal(len(goal), goal.index(0)) if goal else []
+        labels = [0] * len(goal)
+        for tile, label in zip(goal, target):
+            labels[tile] = label
+        tree = None
+        # packed configuration -> zero index and results of the boards
+        pending = {}
+        for result, board in parsed:
+            if board is not None and sorted(board) != sorted(goal):
+                result["error"] = "The board must have the tiles of the goal"
+            elif board is not None and not solvable(board, goal):
+                result["error"] = "The initial state is not solvable"
+            if "error" in result:
+                yield result
+                continue
+            if tree is None:
+                tree = self._tree(target)
+            key = pack([labels[tile] for tile in board], tree.context)
+            if key in tree.parents:
+                yield self._answer(tree, key, board.index(0), result, True)
+            else:
+                pending.setdefault(key, (board.index(0), []))[1].append(
+                    result)
+        while pending and tree.frontier and self._grow(tree):
+            for key in [key for key in pending if key in tree.parents]:
+                zero, results = pending.pop(key)
+                for result in results:
+                    yield self._answer(tree, key, zero, result, False)
+        for _, results in pending.values():
+            for result in results:
+                result.update(solved=False, moves=[], cost=None,
+                              depth=tree.depth, reused=False)
+                yield result
+
+    def _answer(self, tree, key, zero, result, reused):
+        moves = tree.moves(key, zero)
+        result.update(solved=True, moves=moves, cost=len(moves),
+                      depth=tree.depth, reused=reused)
+        return result
+
+    def stats(self):
+        """sizes of the searches and the counters"""
+        return {"goals": len(self._trees),
+                "states": sum(len(t) for t in self._trees.values()),
+                "expanded": self.expanded, "evictions": self.evictions}
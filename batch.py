@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""Solve many boards in a pool of processes
+
+Initial states are read one per line (format 0,1,2,3 etc, empty lines and
+lines starting with # are skipped) and the results are written as JSON
+lines: index of the line, initial state, moves, cost, nodes, depth,
+max_depth, cached (the moves came from the solution cache), time, peak
+RSS of the worker process. Boards which can not be parsed or solved get
+an "error" field instead.
+
+solve_threads() solves the boards in a pool of threads of one process
+instead. The solvers share the search tables (they have no module state),
+so it is faster to start and uses less memory, but the searches run in
+parallel only on a free-threaded Python build.
+
+The method "shared" answers all the boards by one breadth-first search
+from the goal, see backward_bfs.py. It reads the boards in windows of
+1000 and writes the results of a window before reading the next one.
+"""
+import argparse
+import json
+import os
+import sys
+import resource
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor,\
+    ThreadPoolExecutor, wait
+from itertools import islice
+from resource import RUSAGE_SELF
+
+from backward_bfs import BackwardSearch
+from cache import SolutionCache
+from heuristics import HEURISTICS
+from search import Solver, parse_state
+
+# solution cache of the worker process or thread, see solve_one()
+_local = threading.local()
+
+
+def solve_one(job):
+    """solve one board, the function run by the workers
+
+    Parameters
+    ----------
+    job : tuple(int, str, str, dict)
+        index of the board, initial state string, method and keyword
+        arguments: zl, heuristic, maxnodes and optionally cache (sqlite
+        file of the solution cache, opened once per process or thread)
+
+    Returns
+    -------
+    dict
+        JSON-serializable result
+    """
+    index, initial, method, options = job
+    result = {"index": index, "initial": initial}
+    cache = getattr(_local, "cache", None)
+    if options.get("cache") and cache is None:
+        cache = _local.cache = SolutionCache(path=options["cache"])
+    try:
+        solver = Solver(method, parse_state(initial), zl=options["zl"],
+                        heuristic=options["heuristic"], cache=cache)
+        final_state = solver.solve(maxnodes=options["maxnodes"])
+    except (ValueError, AttributeError) as e:
+        result["error"] = str(e)
+        return result
+    except Exception as e:
+        # a failure of one board must not stop the results of the others
+        result["error"] = "{}: {}".format(type(e).__name__, e)
+        return result
+    stats = solver.statistics
+    result.update(
+        solved=final_state is not None,
+        moves=stats.moves,
+        cost=len(stats.moves) if final_state else None,
+        nodes=stats.nodes,
+        depth=final_state.depth if final_state else None,
+        max_depth=stats.max_depth,
+        cached=stats.cached,
+        time=round(stats.total_time, 6),
+        peak_rss_mb=resource.getrusage(RUSAGE_SELF).ru_maxrss / 1000)
+    return result
+
+
+def read_states(lines):
+    """initial states from lines, skipping empty lines and comments"""
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def _solve_chunk(jobs):
+    return [solve_one(job) for job in jobs]
+
+
+def _results(executor, jobs, window, ordered, chunksize=1):
+    """results of the jobs run by the executor in chunks, at most
+    ``window`` chunks are taken from ``jobs`` ahead of the results"""
+    pending = []
+    while True:
+        while len(pending) < window:
+            chunk = list(islice(jobs, chunksize))
+            if not chunk:
+                break
+            pending.append(executor.submit(_solve_chunk, chunk))
+        if not pending:
+            return
+        if ordered:
+            yield from pending.pop(0).result()
+        else:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                yield from future.result()
+
+
+def solve_batch(states, method, workers=None, ordered=False, zl=False,
+                heuristic="manhattan", maxnodes=200000, chunksize=1,
+                cache=None):
+    """solve boards in a pool of processes
+
+    The workers are not daemonic, so hdastar can start its own processes
+    in them. At most twice as many chunks as there are processes are
+    taken from ``states`` ahead of the results.
+
+    Parameters
+    ----------
+    states : iterable of str
+        initial states in format 0,1,2,3 etc, consumed lazily
+    method : str
+        method of search
+    workers : int, optional
+        number of processes, by default the number of CPUs
+    ordered : bool
+        yield results in the order of the states instead of the order
+        of completion, default False
+    chunksize : int
+        boards sent to a worker at once, default 1
+    cache : str, optional
+        sqlite file of the solution cache shared by the workers
+
+    Yields
+    ------
+    dict
+        result of solve_one() for every state
+    """
+    workers = workers or os.cpu_count()
+    options = {"zl": zl, "heuristic": heuristic, "maxnodes": maxnodes,
+               "cache": cache}
+    jobs = ((i, state, method, options) for i, state in enumerate(states))
+    with ProcessPoolExecutor(workers) as executor:
+        yield from _results(executor, jobs, 2 * workers, ordered, chunksize)
+
+
+def solve_threads(states, method, workers=None, ordered=False, zl=False,
+                  heuristic="manhattan", maxnodes=200000, cache=None):
+    """solve boards in a pool of threads
+
+    The same as solve_batch(), but the workers are threads of this
+    process. At most twice as many boards as there are threads are taken
+    from ``states`` ahead of the results.
+
+    Yields
+    ------
+    dict
+        result of solve_one() for every state
+    """
+    workers = workers or os.cpu_count()
+    options = {"zl": zl, "heuristic": heuristic, "maxnodes": maxnodes,
+               "cache": cache}
+    jobs = ((i, state, method, options) for i, state in enumerate(states))
+    with ThreadPoolExecutor(workers) as executor:
+        yield from _results(executor, jobs, 2 * workers, ordered)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description="solve boards from a file, one per line, and print "
+                    "the results as JSON lines")
+    parser.add_argument("method", help="method of search, or shared for\
+                        one backward search for all the boards")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="file with initial states, default stdin")
+    parser.add_argument("-o", "--output", default="-",
+                        help="output file, default stdout")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="number of processes, default number of CPUs")
+    parser.add_argument("-t", "--threads", action='store_true',
+                        help="use threads of one process instead of\
+                        processes")
+    parser.add_argument("--ordered", action='store_true',
+                        help="write results in the input order,\
+                        default in the order of completion")
+    parser.add_argument("-c", "--chunksize", type=int, default=1,
+                        help="boards sent to a worker at once, default 1")
+    parser.add_argument("-n", "--nodes", default='200000',
+                        help="maximum number of nodes to visit,\
+                             default 200 000")
+    parser.add_argument("-zl", "--zerolast", action='store_true',
+                        help="zero is the last element of the goal")
+    parser.add_argument("-H", "--heuristic", default="manhattan",
+                        choices=list(HEURISTICS),
+                        help="distance estimate for ast and idastar,\
+                        default manhattan")
+    parser.add_argument("--cache", default=None,
+                        help="sqlite file of the solution cache")
+    parser.add_argument("--max-states", type=int, default=1000000,
+                        help="states kept by the shared method, default\
+                        1 000 000")
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    with source, output:
+        if args.method == "shared":
+            results = BackwardSearch(args.max_states).solve(
+                read_states(source), zl=args.zerolast)
+        elif args.threads:
+            results = solve_threads(read_states(source), args.method,
+                                    workers=args.workers,
+                                    ordered=args.ordered, zl=args.zerolast,
+                                    heuristic=args.heuristic,
+                                    maxnodes=int(args.nodes),
+                                    cache=args.cache)
+        else:
+            results = solve_batch(read_states(source), args.method,
+                                  workers=args.workers, ordered=args.ordered,
+                                  zl=args.zerolast, heuristic=args.heuristic,
+                                  maxnodes=int(args.nodes),
+                                  chunksize=args.chunksize,
+                                  cache=args.cache)
+        for result in results:
+            output.write(json.dumps(result) + "\n")
+            output.flush()
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""Reproducible benchmarks of the solver methods
+
+Instance sets are text files in the instances directory, one board per
+line like for batch.py. They are made once by the ``generate`` command
+with a fixed seed and kept in the repository, so the boards do not depend
+on the random module of the Python version:
+
+    3x3          random solvable 3x3 boards, five for every optimal depth
+                 4, 8, ..., 28 (a "# depth N" line before every group)
+    4x4          random walks of 40 moves from the goal of the 4x4 board
+    4x4-random   100 uniformly random solvable 4x4 boards, a seeded
+                 equivalent of Korf's 100 instances (very hard for
+                 anything but idastar with the pdb heuristic)
+
+All the boards are for the goal 0,1,2,... The ``run`` command solves every
+instance with every combination of methods and heuristics, one board per
+fresh worker process so that the peak RSS belongs to that board only, and
+writes nodes, nodes per second, wall time and peak memory to a JSON or
+CSV file. The ``compare`` command reads a stored baseline and new results
+and reports regressions, the exit code is 1 if there are any. The
+``expand`` command is a microbenchmark of the node expansion of ast: the
+best of several runs on the boards of tests.py in expanded nodes per
+second. The ``scale`` command times the fast method on seeded random
+boards of growing sides. The ``threads`` command solves an instance set
+with batch.solve_threads() for several numbers of threads and reports the
+speedup over one thread, which is above 1 only on a free-threaded build.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import distance_table
+from batch import solve_one, solve_threads
+from heuristics import HEURISTICS
+from search import Solver, solvable
+
+INSTANCES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "instances")
+INSTANCE_SETS = {"3x3": "3x3_by_depth.txt",
+                 "4x4": "4x4_walks.txt",
+                 "4x4-random": "4x4_random.txt"}
+SEED = 2020
+HEURISTIC_METHODS = ("ast", "idastar", "hdastar")
+# boards of tests.py and whether zero is the last element of the goal
+EXPANSION_BOARDS = [([8, 6, 4, 2, 1, 3, 5, 7, 0], False),
+                    ([6, 1, 8, 4, 0, 2, 7, 3, 5], False),
+                    ([1, 2, 3, 4, 13, 9, 14, 5, 12, 10, 15, 0, 11, 8, 7, 6],
+                     True)]
+FIELDS = ["set", "group", "index", "initial", "method", "heuristic",
+          "solved", "cost", "nodes", "nodes_per_sec", "time", "peak_rss_mb"]
+
+
+def random_board(side, rnd):
+    """uniformly random board solvable for the goal 0,1,2,..."""
+    goal = list(range(side * side))
+    while True:
+        board = goal.copy()
+        rnd.shuffle(board)
+        if solvable(board, goal):
+            return board
+
+
+def random_walk(side, length, rnd):
+    """board after ``length`` random moves from the goal 0,1,2,...,
+    never undoing the last move"""
+    board = list(range(side * side))
+    zero, previous = 0, None
+    for _ in range(length):
+        row, col = divmod(zero, side)
+        cells = [zero + d for d, ok in ((-side, row > 0),
+                                        (side, row < side - 1),
+                                        (-1, col > 0),
+                                        (1, col < side - 1))
+                 if ok and zero + d != previous]
+        new_zero = rnd.choice(cells)
+        board[zero], board[new_zero] = board[new_zero], 0
+        previous, zero = zero, new_zero
+    return board
+
+
+def boards_by_depth(depths, per_depth, rnd):
+    """random 3x3 boards grouped by the optimal number of moves
+
+    Returns
+    -------
+    dict
+        depth -> list of boards
+    """
+    table = distance_table.load(3, list(range(9)))
+    groups = {depth: [] for depth in depths}
+    while any(len(group) < per_depth for group in groups.values()):
+        board = random_board(3, rnd)
+        group = groups.get(table.distance(board))
+        if group is not None and len(group) < per_depth:
+            group.append(board)
+    return groups
+
+
+def generate(directory=INSTANCES_DIR, seed=SEED):
+    """write the instance sets, the same files for the same seed"""
+    os.makedirs(directory, exist_ok=True)
+    header = "# generated by benchmark.py generate, seed {}\n".format(seed)
+
+    def line(board):
+        return ",".join(map(str, board)) + "\n"
+
+    rnd = random.Random(seed)
+    with open(os.path.join(directory, INSTANCE_SETS["3x3"]), "w") as f:
+        f.write(header)
+        for depth, boards in boards_by_depth(range(4, 29, 4), 5,
+                                             rnd).items():
+            f.write("# depth {}\n".format(depth))
+            f.writelines(map(line, boards))
+    with open(os.path.join(directory, INSTANCE_SETS["4x4"]), "w") as f:
+        f.write(header)
+        f.writelines(line(random_walk(4, 40, rnd)) for _ in range(20))
+    with open(os.path.join(directory, INSTANCE_SETS["4x4-random"]), "w") as f:
+        f.write(header)
+        f.writelines(line(random_board(4, rnd)) for _ in range(100))
+
+
+def read_instances(name, directory=INSTANCES_DIR):
+    """boards of an instance set
+
+    Returns
+    -------
+    list[tuple(str, str)]
+        group (the last "# depth N" comment without "# ", or "") and
+        initial state string
+    """
+    instances = []
+    group = ""
+    with open(os.path.join(directory, INSTANCE_SETS[name])) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("# depth"):
+                group = line[2:]
+            elif line and not line.startswith("#"):
+                instances.append((group, line))
+    return instances
+
+
+def combinations(methods, heuristics):
+    """(method, heuristic) pairs, heuristic is None for the methods which
+    do not use one"""
+    for method in methods:
+        if method in HEURISTIC_METHODS:
+            for heuristic in heuristics:
+                yield method, heuristic
+        else:
+            yield method, None
+
+
+def run(sets, methods, heuristics=("manhattan",), maxnodes=500000,
+        repeat=1, limit=None, directory=INSTANCES_DIR):
+    """solve the instance sets with every method and heuristic
+
+    Parameters
+    ----------
+    sets : list[str]
+        names of the instance sets, see INSTANCE_SETS
+    methods, heuristics : list[str]
+        methods of Solver and heuristics for the methods which use them
+    repeat : int
+        number of runs of every board, the fastest one is recorded
+    limit : int, optional
+        number of boards from the beginning of every set, default all
+
+    Yields
+    ------
+    dict
+        one record with the FIELDS for every board, method and heuristic
+    """
+    for name in sets:
+        instances = read_instances(name, directory)[:limit]
+        for method, heuristic in combinations(methods, heuristics):
+            options = {"zl": False, "heuristic": heuristic or "manhattan",
+                       "maxnodes": maxnodes}
+            for index, (group, initial) in enumerate(instances):
+                results = [_solve_in_new_process((index, initial, method,
+                                                  options))
+                           for _ in range(repeat)]
+                result = min(results, key=lambda r: r.get("time", 0))
+                yield record(name, group, method, heuristic, result)
+
+
+def _solve_in_new_process(job):
+    """batch.solve_one(job) in a new process, so ru_maxrss is the peak of
+    the board; the workers of an executor are not daemonic, so hdastar can
+    start its own processes in them"""
+    with ProcessPoolExecutor(1) as pool:
+        return pool.submit(solve_one, job).result()
+
+
+def record(name, group, method, heuristic, result):
+    """benchmark record from a result of batch.solve_one"""
+    row = {"set": name, "group": group, "index": result["index"],
+           "initial": result["initial"], "method": method,
+           "heuristic": heuristic or ""}
+    if "error" in result:
+        row.update(solved=False, cost=None, nodes=0, nodes_per_sec=0,
+                   time=0, peak_rss_mb=0)
+        return row
+    row.update(solved=result["solved"], cost=result["cost"],
+               nodes=result["nodes"],
+               nodes_per_sec=round(result["nodes"] / result["time"])
+               if result["time"] else 0,
+               time=result["time"], peak_rss_mb=result["peak_rss_mb"])
+    return row
+
+
+def save(path, records):
+    """write the records to a CSV file if the name ends with .csv,
+    otherwise to a JSON file"""
+    with open(path, "w", newline="") as f:
+        if path.endswith(".csv"):
+            writer = csv.DictWriter(f, FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+        else:
+            json.dump(records, f, indent=1)
+
+
+def load(path):
+    """records written by save()"""
+    with open(path, newline="") as f:
+        if not path.endswith(".csv"):
+            return json.load(f)
+        records = list(csv.DictReader(f))
+    for row in records:
+        row["index"] = int(row["index"])
+        row["solved"] = row["solved"] == "True"
+        row["cost"] = int(row["cost"]) if row["cost"] else None
+        for name in ("nodes", "nodes_per_sec"):
+            row[name] = int(row[name])
+        for name in ("time", "peak_rss_mb"):
+            row[name] = float(row[name])
+    return records
+
+
+def summary(records):
+    """totals for every instance set, method and heuristic
+
+    Returns
+    -------
+    dict
+        (set, method, heuristic) -> dict with boards, solved, nodes, time
+        and the largest peak_rss_mb
+    """
+    totals = {}
+    for row in records:
+        key = (row["set"], row["method"], row["heuristic"])
+        total = totals.setdefault(key, {"boards": 0, "solved": 0, "nodes": 0,
+                                        "time": 0.0, "peak_rss_mb": 0.0})
+        total["boards"] += 1
+        total["solved"] += row["solved"]
+        total["nodes"] += row["nodes"]
+        total["time"] += row["time"]
+        total["peak_rss_mb"] = max(total["peak_rss_mb"], row["peak_rss_mb"])
+    return totals
+
+
+def compare(baseline, current, time_tolerance=0.2, memory_tolerance=0.2):
+    """regressions of the current records against the baseline
+
+    A board is a regression if it is not solved any more, its path got
+    longer or more nodes were expanded (the searches are deterministic).
+    Total time and the peak memory of a set, method and heuristic are
+    regressions if they grew by more than the tolerance (a fraction).
+
+    Returns
+    -------
+    list[str]
+        descriptions of the regressions, empty if there are none
+    """
+    regressions = []
+    old = {(r["set"], r["index"], r["method"], r["heuristic"]): r
+           for r in baseline}
+    for row in current:
+        key = (row["set"], row["index"], row["method"], row["heuristic"])
+        if key not in old:
+            continue
+        before = old[key]
+        name = "{} #{} {} {}".format(*key).rstrip()
+        if before["solved"] and not row["solved"]:
+            regressions.append("{}: not solved".format(name))
+        elif before["solved"] and row["cost"] > before["cost"]:
+            regressions.append("{}: cost {} -> {}".format(
+                name, before["cost"], row["cost"]))
+        if row["nodes"] > before["nodes"]:
+            regressions.append("{}: nodes {} -> {}".format(
+                name, before["nodes"], row["nodes"]))
+    old_totals = summary(baseline)
+    for key, total in summary(current).items():
+        if key not in old_totals:
+            continue
+        name = " ".join(key).rstrip()
+        for field, tolerance in (("time", time_tolerance),
+                                 ("peak_rss_mb", memory_tolerance)):
+            before = old_totals[key][field]
+            if before and total[field] > before * (1 + tolerance):
+                regressions.append("{}: {} {:.3f} -> {:.3f} (+{:.0%})".format(
+                    name, field, before, total[field],
+                    total[field] / before - 1))
+    return regressions
+
+
+def expansion_speed(heuristic="manhattan", repeat=5, method="ast"):
+    """expanded nodes per second of the method on EXPANSION_BOARDS
+
+    Returns
+    -------
+    list[tuple(str, int, float)]
+        board, expanded nodes and nodes per second of the fastest run
+    """
+    speeds = []
+    for board, zl in EXPANSION_BOARDS:
+        best = None
+        for _ in range(repeat):
+            solver = Solver(method, board, zl=zl, heuristic=heuristic)
+            start = time.perf_counter()
+            solver.solve()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        speeds.append((",".join(map(str, board)), solver.statistics.nodes,
+                       solver.statistics.nodes / best))
+    return speeds
+
+
+def fast_scaling(sides, boards=10, seed=SEED, shorten=True):
+    """time and moves of the fast method on random boards of every side
+
+    Returns
+    -------
+    list[dict]
+        side, number of boards, mean and maximum time in milliseconds,
+        mean number of moves and mean number of moves before shortening
+    """
+    rnd = random.Random(seed)
+    rows = []
+    for side in sides:
+        times = []
+        costs = []
+        raw_costs = []
+        for _ in range(boards):
+            solver = Solver("fast", random_board(side, rnd), shorten=shorten)
+            start = time.perf_counter()
+            solver.solve()
+            times.append((time.perf_counter() - start) * 1000)
+            costs.append(len(solver.statistics.moves))
+            raw_costs.append(solver.statistics.nodes)
+        rows.append({"side": side, "boards": boards,
+                     "mean_ms": round(sum(times) / boards, 3),
+                     "max_ms": round(max(times), 3),
+                     "mean_cost": round(sum(costs) / boards, 1),
+                     "mean_cost_before_shortening":
+                     round(sum(raw_costs) / boards, 1)})
+    return rows
+
+
+def thread_scaling(instance_set="3x3", method="ast", threads=(1, 2, 4),
+                   maxnodes=500000, repeat=1):
+    """wall time of solve_threads() on an instance set
+
+    Returns
+    -------
+    list[dict]
+        number of threads, boards, solved boards, seconds (the best of
+        ``repeat`` runs), speedup over the first number of threads and
+        whether the GIL is enabled
+    """
+    boards = [board for _, board in read_instances(instance_set)]
+    # not defined before Python 3.13
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    rows = []
+    for workers in threads:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = list(solve_threads(boards, method, workers,
+                                         maxnodes=maxnodes))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        rows.append({"threads": workers, "boards": len(results),
+                     "solved": sum(bool(r.get("solved")) for r in results),
+                     "seconds": round(best, 3),
+                     "speedup": round(rows[0]["seconds"] / best, 2)
+                     if rows else 1.0, "gil": gil})
+    return rows
+
+
+def print_summary(records):
+    for (name, method, heuristic), total in summary(records).items():
+        print("{:<11} {:<8} {:<17} solved: {}/{:<4} nodes: {:<10} "
+              "nodes/s: {:<8} time: {:.3f} s  peak_rss: {:.1f} MB".format(
+                  name, method, heuristic, total["solved"], total["boards"],
+                  total["nodes"],
+                  round(total["nodes"] / total["time"]) if total["time"]
+                  else 0, total["time"], total["peak_rss_mb"]))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description="benchmarks of the solver methods on fixed instance sets")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parser_run = commands.add_parser("run", help="run the benchmarks")
+    parser_run.add_argument("-s", "--sets", default="3x3",
+                            help="comma-separated instance sets: {},\
+                            default 3x3".format(", ".join(INSTANCE_SETS)))
+    parser_run.add_argument("-m", "--methods", default="ast,idastar,bibfs",
+                            help="comma-separated methods,\
+                            default ast,idastar,bibfs")
+    parser_run.add_argument("-H", "--heuristics", default="manhattan",
+                            help="comma-separated heuristics for ast,\
+                            idastar and hdastar: {}, default manhattan"
+                            .format(", ".join(HEURISTICS)))
+    parser_run.add_argument("-n", "--nodes", default='500000',
+                            help="maximum number of nodes to visit,\
+                            default 500 000")
+    parser_run.add_argument("-r", "--repeat", type=int, default=1,
+                            help="runs of every board, the fastest is kept")
+    parser_run.add_argument("-l", "--limit", type=int, default=None,
+                            help="boards from the beginning of every set,\
+                            default all")
+    parser_run.add_argument("-o", "--output", default=None,
+                            help="JSON or CSV (.csv) file for the results")
+
+    parser_compare = commands.add_parser(
+        "compare", help="compare results with a baseline")
+    parser_compare.add_argument("baseline", help="stored results")
+    parser_compare.add_argument("current", help="new results")
+    parser_compare.add_argument("-t", "--time-tolerance", type=float,
+                                default=0.2,
+                                help="allowed growth of the total time,\
+                                default 0.2 (20%%)")
+    parser_compare.add_argument("-M", "--memory-tolerance", type=float,
+                                default=0.2,
+                                help="allowed growth of the peak memory,\
+                                default 0.2 (20%%)")
+
+    parser_expand = commands.add_parser(
+        "expand", help="expanded nodes per second on the tests.py boards")
+    parser_expand.add_argument("-H", "--heuristic", default="manhattan",
+                               choices=list(HEURISTICS),
+                               help="heuristic, default manhattan")
+    parser_expand.add_argument("-m", "--method", default="ast",
+                               help="method of search, default ast")
+    parser_expand.add_argument("-r", "--repeat", type=int, default=5,
+                               help="runs of every board, default 5")
+
+    parser_scale = commands.add_parser(
+        "scale", help="time of the fast method on random boards")
+    parser_scale.add_argument("-s", "--sides", default="3-10",
+                              help="range of the board sides, default 3-10")
+    parser_scale.add_argument("-b", "--boards", type=int, default=10,
+                              help="boards of every side, default 10")
+    parser_scale.add_argument("--no-shorten", dest="shorten",
+                              action='store_false',
+                              help="keep the cycles in the paths")
+
+    parser_threads = commands.add_parser(
+        "threads", help="speedup of the batch solving in threads")
+    parser_threads.add_argument("-s", "--set", default="3x3",
+                                choices=list(INSTANCE_SETS),
+                                help="instance set, default 3x3")
+    parser_threads.add_argument("-m", "--method", default="ast",
+                                help="method of search, default ast")
+    parser_threads.add_argument("-t", "--threads", default="1,2,4",
+                                help="comma-separated numbers of threads,\
+                                default 1,2,4")
+    parser_threads.add_argument("-r", "--repeat", type=int, default=3,
+                                help="runs of the set, default 3")
+
+    commands.add_parser("generate", help="write the instance sets again")
+    args = parser.parse_args()
+
+    if args.command == "expand":
+        for board, nodes, speed in expansion_speed(args.heuristic,
+                                                   args.repeat, args.method):
+            print("{:<38} nodes: {:<7} nodes/s: {}".format(board, nodes,
+                                                           round(speed)))
+    elif args.command == "scale":
+        first, _, last = args.sides.partition("-")
+        for row in fast_scaling(range(int(first), int(last or first) + 1),
+                                args.boards, shorten=args.shorten):
+            print(json.dumps(row))
+    elif args.command == "threads":
+        for row in thread_scaling(args.set, args.method,
+                                  [int(t) for t in args.threads.split(",")],
+                                  repeat=args.repeat):
+            print(json.dumps(row))
+    elif args.command == "generate":
+        generate()
+        print("saved to", INSTANCES_DIR)
+    elif args.command == "run":
+        records = []
+        for row in run(args.sets.split(","), args.methods.split(","),
+                       args.heuristics.split(","), int(args.nodes),
+                       args.repeat, args.limit):
+            records.append(row)
+        print_summary(records)
+        if args.output:
+            save(args.output, records)
+    else:
+        current = load(args.current)
+        print_summary(current)
+        regressions = compare(load(args.baseline), current,
+                              args.time_tolerance, args.memory_tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            sys.exit(1)
+        print("no regressions")
@@ -0,0 +1,183 @@
+"""Cache of optimal solutions
+
+Boards are keyed by their canonical form: the smaller (as bytes, one byte
+per tile) of the board and its reflection about the main diagonal with
+the tiles relabeled, which maps the goal to itself when the empty cell of
+the goal is on the diagonal (both goals of Solver). The moves of a
+reflected board are the cached moves with U and L, D and R swapped.
+
+Every suffix of an optimal path is optimal, so put() stores all the
+states of a solution. The cache has a size-bounded LRU tier in memory
+and an optional one in a sqlite file, which can be shared by processes
+and keeps the least recently used entries out when it is full.
+"""
+import sqlite3
+from collections import OrderedDict
+
+REFLECT = str.maketrans("UDLR", "LRUD")
+MOVES = {"U": -1, "D": 1, "L": -1, "R": 1}
+
+
+class SolutionCache():
+    """two-tier cache of the moves to the goal
+
+    Arguments
+    ----------
+    maxsize : int
+        number of states in memory, default 100 000
+    path : str, optional
+        sqlite file of the disk tier, by default no disk tier
+    disk_maxsize : int
+        number of states in the file, default 10 000 000
+
+    Attributes
+    ----------
+        hits, disk_hits, misses : int
+            lookups found in memory, on disk and not found
+        evictions : int
+            states dropped from memory and from the file
+    """
+    def __init__(self, maxsize=100000, path=None, disk_maxsize=10000000):
+        self.maxsize = maxsize
+        self.disk_maxsize = disk_maxsize
+        self._memory = OrderedDict()
+        self._symmetries = {}
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, timeout=30)
+            self._db.execute("CREATE TABLE IF NOT EXISTS solutions "
+                             "(key BLOB PRIMARY KEY, moves TEXT, "
+                             "used INTEGER)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS solutions_used "
+                             "ON solutions (used)")
+            self._clock, self._disk_size = self._db.execute(
+                "SELECT COALESCE(MAX(used), 0), COUNT(*) "
+                "FROM solutions").fetchone()
+
+    def _reflection(self, goal):
+        """(positions, relabeling) of the diagonal reflection, None if
+        the empty cell of the goal is not on the diagonal"""
+        goal = tuple(goal)
+        if goal not in self._symmetries:
+            side = int(round(len(goal) ** 0.5))
+            position = [(i % side) * side + i // side
+                        for i in range(len(goal))]
+            reflection = None
+            if position[goal.index(0)] == goal.index(0):
+                relabel = [0] * len(goal)
+                for i, tile in enumerate(goal):
+                    relabel[tile] = goal[position[i]]
+                reflection = (position, relabel)
+            self._symmetries[goal] = reflection
+        return self._symmetries[goal]
+
+    def canonical(self, board, goal):
+        """canonical key of the board
+
+        Returns
+        -------
+        tuple(bytes, bool)
+            key (goal and board) and True if the key is the reflection
+        """
+        key = bytes(board)
+        reflected = False
+        reflection = self._reflection(goal)
+        if reflection is not None:
+            position, relabel = reflection
+            other = bytes(relabel[board[p]] for p in position)
+            if other < key:
+                key, reflected = other, True
+        return bytes(goal) + key, reflected
+
+    def get(self, board, goal):
+        """cached moves from the board to the goal, None if not cached"""
+        key, reflected = self.canonical(board, goal)
+        moves = self._memory.get(key)
+        if moves is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+        elif self._db is not None:
+            row = self._db.execute("SELECT moves FROM solutions WHERE key=?",
+                                   (key,)).fetchone()
+            if row is not None:
+                moves = row[0]
+                self.disk_hits += 1
+                self._clock += 1
+                with self._db:
+                    self._db.execute("UPDATE solutions SET used=? "
+                                     "WHERE key=?", (self._clock, key))
+                self._remember(key, moves)
+        if moves is None:
+            self.misses += 1
+            return None
+        return list(moves.translate(REFLECT) if reflected else moves)
+
+    def put(self, board, goal, moves):
+        """store an optimal solution and all its suffixes"""
+        board = list(board)
+        side = int(round(len(board) ** 0.5))
+        zero = board.index(0)
+        rows = []
+        moves = "".join(moves)
+        for i, direction in enumerate(moves):
+            rows.append(self._store(board, goal, moves[i:]))
+            new_zero = zero + MOVES[direction] * (side if direction in "UD"
+                                                  else 1)
+            board[zero], board[new_zero] = board[new_zero], 0
+            zero = new_zero
+        rows.append(self._store(board, goal, ""))
+        if self._db is not None:
+            with self._db:
+                changes = self._db.total_changes
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO solutions VALUES (?, ?, ?)",
+                    [(key, stored, self._clock + i + 1)
+                     for i, (key, stored) in enumerate(rows)])
+                self._clock += len(rows)
+                self._disk_size += self._db.total_changes - changes
+                extra = self._disk_size - self.disk_maxsize
+                if extra > 0:
+                    self._db.execute(
+                        "DELETE FROM solutions WHERE key IN (SELECT key "
+                        "FROM solutions ORDER BY used LIMIT ?)", (extra,))
+                    self._disk_size -= extra
+                    self.evictions += extra
+
+    def _store(self, board, goal, moves):
+        """put the moves of one board to memory
+
+        Returns
+        -------
+        tuple(bytes, str)
+            key and the moves of the canonical board
+        """
+        key, reflected = self.canonical(board, goal)
+        if reflected:
+            moves = moves.translate(REFLECT)
+        self._remember(key, moves)
+        return key, moves
+
+    def _remember(self, key, moves):
+        self._memory[key] = moves
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        """hit and miss counts and the sizes of the tiers"""
+        lookups = self.hits + self.disk_hits + self.misses
+        result = {"hits": self.hits, "disk_hits": self.disk_hits,
+                  "misses": self.misses,
+                  "hit_rate": round((lookups - self.misses) / lookups, 4)
+                  if lookups else 0.0,
+                  "evictions": self.evictions, "size": len(self._memory)}
+        if self._db is not None:
+            result["disk_size"] = self._disk_size
+        return result
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
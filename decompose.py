@@ -0,0 +1,227 @@
+"""Fast solver for large boards by decomposition
+
+The board is turned (by flipping the rows and/or the columns) so that
+the empty cell of the goal is in the bottom right corner. Then, while
+the unsolved part is larger than 3x3, its top row (if it has at least as
+many rows as columns) or its left column is solved and locked. The tiles
+of a row or a column are moved one by one to their cells: a tile goes
+along a shortest path over the free cells and before every step the
+empty cell is brought in front of it around the tile. The last two tiles
+of a line need a turn: the last tile is parked in the far corner of the
+unsolved part, the one before it is put into the last cell, the last
+tile below (or to the right of) it, and two moves of the empty cell
+slide both into place. The last 3x3 is solved optimally with the
+distance table.
+
+Every tile takes O(n) steps of O(n^2) breadth-first searches, so the
+running time is O(n^5) for an n x n board. The path is not optimal;
+shorten() drops the moves between two visits of the same configuration.
+"""
+import random
+from collections import deque
+
+import distance_table
+from patterndb import grid_neighbours
+
+# goal of the distance table of the last 3x3
+TABLE_GOAL = list(range(1, 9)) + [0]
+FLIP_ROWS = str.maketrans("UD", "DU")
+FLIP_COLUMNS = str.maketrans("LR", "RL")
+# modulus of the configuration hashes of shorten(), a Mersenne prime
+HASH_PRIME = 2 ** 127 - 1
+_random = random.Random()
+
+
+class _Board():
+    """board with locked cells, records the moves of the zero element"""
+
+    def __init__(self, board, goal, side):
+        self.side = side
+        self.cells = list(board)
+        self.goal = goal
+        self.position = [0] * len(board)
+        for cell, tile in enumerate(board):
+            self.position[tile] = cell
+        self.locked = [False] * len(board)
+        self.neighbours = grid_neighbours(side)
+        self.moves = []
+
+    def move(self, cell):
+        """move the zero element to an adjacent cell"""
+        zero = self.position[0]
+        tile = self.cells[cell]
+        self.cells[zero], self.cells[cell] = tile, 0
+        self.position[tile], self.position[0] = zero, cell
+        self.moves.append(distance_table.direction(zero, cell, self.side))
+
+    def path(self, start, end, blocked=None):
+        """shortest path over the free cells, without start"""
+        parents = {start: None}
+        queue = deque([start])
+        while queue:
+            cell = queue.popleft()
+            if cell == end:
+                break
+            for new in self.neighbours[cell]:
+                if new not in parents and not self.locked[new] and\
+                        new != blocked:
+                    parents[new] = cell
+                    queue.append(new)
+        if end not in parents:
+            raise RuntimeError("cell {} can not be reached".format(end))
+        path = []
+        while end != start:
+            path.append(end)
+            end = parents[end]
+        return path[::-1]
+
+    def zero_to(self, cell, blocked=None):
+        for step in self.path(self.position[0], cell, blocked):
+            self.move(step)
+
+    def tile_to(self, tile, cell):
+        for step in self.path(self.position[tile], cell):
+            self.zero_to(step, blocked=self.position[tile])
+            self.move(self.position[tile])
+
+    def solve_line(self, cells, helper, corner):
+        """place and lock the tiles of a row or a column
+
+        Arguments
+        ---------
+        cells : list[int]
+            cells of the line in order, the last one at the edge
+        helper : int
+            free cell next to the last cell, outside the line
+        corner : int
+            free cell far from the end of the line
+        """
+        for cell in cells[:-2]:
+            self.tile_to(self.goal[cell], cell)
+            self.locked[cell] = True
+        before, last = cells[-2:]
+        first, second = self.goal[before], self.goal[last]
+        if self.position[first] != before or self.position[second] != last:
+            # the second tile is kept away while the first one is placed,
+            # otherwise it can be trapped behind it
+            self.tile_to(second, corner)
+            self.locked[corner] = True
+            self.tile_to(first, last)
+            self.locked[last] = True
+            self.locked[corner] = False
+            self.tile_to(second, helper)
+            self.locked[helper] = True
+            self.zero_to(before)
+            self.move(last)
+            self.move(helper)
+            self.locked[helper] = False
+        self.locked[before] = self.locked[last] = True
+
+    def solve_3x3(self, top, left):
+        """solve the 3x3 part from cell (top, left) with the table"""
+        side = self.side
+        cells = [(top + row) * side + left + col for row in range(3)
+                 for col in range(3)]
+        label = {self.goal[cell]: i + 1 for i, cell in enumerate(cells)}
+        label[0] = 0
+        board = [label[self.cells[cell]] for cell in cells]
+        shift = {"U": -side, "D": side, "L": -1, "R": 1}
+        for direction in distance_table.load(3, TABLE_GOAL).moves(board):
+            self.move(self.position[0] + shift[direction])
+
+
+def solve(board, goal, side):
+    """moves of the zero element from the board to the goal
+
+    Parameters
+    ----------
+    board, goal : list[int]
+        tiles configurations, the goal must be reachable and have the
+        zero element in a corner
+    side : int
+        side of the board, at least 3
+
+    Returns
+    -------
+    list[str]
+        directions of the zero element moves
+    """
+    zero_row, zero_col = divmod(goal.index(0), side)
+    if zero_row not in (0, side - 1) or zero_col not in (0, side - 1):
+        raise ValueError("The fast method needs the empty cell of the goal "
+                         "in a corner")
+    flip_rows, flip_columns = zero_row == 0, zero_col == 0
+
+    def turn(cell):
+        row, col = divmod(cell, side)
+        return (side - 1 - row if flip_rows else row) * side +\
+            (side - 1 - col if flip_columns else col)
+
+    turned_board = [0] * len(board)
+    turned_goal = [0] * len(goal)
+    for cell in range(len(board)):
+        turned_board[turn(cell)] = board[cell]
+        turned_goal[turn(cell)] = goal[cell]
+    state = _Board(turned_board, turned_goal, side)
+    top = left = 0
+    while side - top > 3 or side - left > 3:
+        if side - top >= side - left:
+            state.solve_line([top * side + col for col in range(left, side)],
+                             (top + 1) * side + side - 1,
+                             (side - 1) * side + left)
+            top += 1
+        else:
+            state.solve_line([row * side + left for row in range(top, side)],
+                             (side - 1) * side + left + 1,
+                             top * side + side - 1)
+            left += 1
+    state.solve_3x3(top, left)
+    moves = "".join(state.moves)
+    if flip_rows:
+        moves = moves.translate(FLIP_ROWS)
+    if flip_columns:
+        moves = moves.translate(FLIP_COLUMNS)
+    return list(moves)
+
+
+def shorten(board, moves, side):
+    """moves without cycles
+
+    When a configuration is visited again the moves since its first visit
+    are dropped, this also removes every move undone by the next one.
+
+    Configurations are compared by a hash made of a random number of every
+    tile r and of every cell c: the sum of r[tile] * c[cell] modulo the
+    prime HASH_PRIME. A move changes it by (r[tile] - r[0]) * (c[new cell]
+    - c[old cell]), so every step takes O(1) time and memory. Two
+    different configurations have the same hash with the probability of
+    at most 1 / HASH_PRIME.
+    """
+    shift = {"U": -side, "D": side, "L": -1, "R": 1}
+    board = list(board)
+    tile_codes = [_random.randrange(1, HASH_PRIME) for _ in board]
+    cell_codes = [_random.randrange(1, HASH_PRIME) for _ in board]
+    zero = board.index(0)
+    key = sum(tile_codes[tile] * cell_codes[cell]
+              for cell, tile in enumerate(board)) % HASH_PRIME
+    states = [key]
+    seen = {key: 0}
+    path = []
+    for direction in moves:
+        new_zero = zero + shift[direction]
+        tile = board[new_zero]
+        board[zero], board[new_zero] = tile, 0
+        key = (key + (tile_codes[tile] - tile_codes[0]) *
+               (cell_codes[zero] - cell_codes[new_zero])) % HASH_PRIME
+        zero = new_zero
+        index = seen.get(key)
+        if index is None:
+            seen[key] = len(states)
+            states.append(key)
+            path.append(direction)
+        else:
+            for dropped in states[index + 1:]:
+                del seen[dropped]
+            del states[index + 1:]
+            del path[index:]
+    return path
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Perfect distance table of the 3x3 puzzle
+
+A retrograde breadth-first search from the goal gives the optimal number
+of moves for every reachable configuration. The distances are stored in a
+byte array indexed by the rank of the configuration permutation (Lehmer
+code), 9! = 362880 bytes, 255 for the configurations of the other parity.
+An optimal path is then found by a greedy descent: from every state move
+to a neighbour with the distance smaller by one.
+
+The table is written to a file with a short header (magic "DST1", side,
+goal array) and opened with mmap, so loading it is instant and the
+processes share one copy.
+"""
+import argparse
+import math
+import mmap
+import os
+import struct
+import threading
+
+from patterndb import TABLES_DIR, grid_neighbours, write_atomic,\
+    zero_name
+
+MAGIC = b"DST1"
+UNREACHABLE = 255
+FACTORIALS = [math.factorial(i) for i in range(17)]
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+class DistanceTable():
+    """optimal distances to the goal mapped from a file
+
+    Arguments
+    ----------
+    path : str
+        file written by save()
+
+    Attributes
+    ----------
+        side : int
+            side of the board
+        goal : list[int]
+            goal tiles configuration
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.side = struct.unpack_from("<4sB", self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError("{} is not a distance table file".format(path))
+        size = self.side * self.side
+        self.goal = list(self._mm[5:5 + size])
+        self._offset = 5 + size
+        self._neighbours = grid_neighbours(self.side)
+        self._directions = [{} for _ in range(size)]
+        for zero in range(size):
+            for new_zero in self._neighbours[zero]:
+                self._directions[zero][new_zero] = direction(
+                    zero, new_zero, self.side)
+
+    def distance(self, board):
+        """optimal number of moves, None if the goal is not reachable"""
+        value = self._mm[self._offset + rank(board)]
+        return None if value == UNREACHABLE else value
+
+    def moves(self, board):
+        """optimal path by greedy descent, O(depth) table lookups
+
+        Returns
+        -------
+        list[str] or None
+            directions of the zero element moves, None if the goal is
+            not reachable
+        """
+        mm, offset = self._mm, self._offset
+        index = rank(board)
+        dist = mm[offset + index]
+        if dist == UNREACHABLE:
+            return None
+        board = list(board)
+        zero = board.index(0)
+        moves = []
+        while dist:
+            for new_zero in self._neighbours[zero]:
+                new_index = swapped_rank(board, index, zero, new_zero)
+                if mm[offset + new_index] == dist - 1:
+                    break
+            moves.append(self._directions[zero][new_zero])
+            board[zero], board[new_zero] = board[new_zero], 0
+            index, zero = new_index, new_zero
+            dist -= 1
+        return moves
+
+    def close(self):
+        self._mm.close()
+
+
+def direction(zero, new_zero, side):
+    """direction of the zero element move between two adjacent cells"""
+    if new_zero == zero - side:
+        return "U"
+    if new_zero == zero + side:
+        return "D"
+    return "L" if new_zero == zero - 1 else "R"
+
+
+def rank(board):
+    """Lehmer code of the permutation, a number in range(n!)"""
+    index = 0
+    size = len(board)
+    for i, tile in enumerate(board):
+        smaller = 0
+        for other in board[i + 1:]:
+            if other < tile:
+                smaller += 1
+        index = index * (size - i) + smaller
+    return index
+
+
+def swapped_rank(board, index, i, j):
+    """rank of the board with the elements i and j swapped
+
+    Only the Lehmer digits of the positions from i to j change, so the
+    update costs O(n) instead of O(n^2) of rank().
+
+    Parameters
+    ----------
+    board : list[int]
+        permutation before the swap
+    index : int
+        its rank
+    """
+    a, b = min(i, j), max(i, j)
+    x, y = board[a], board[b]
+    size = len(board)
+    delta = 0
+    between_x = between_y = 0
+    for k in range(a + 1, b):
+        m = board[k]
+        if m < x:
+            between_x += 1
+        if m < y:
+            between_y += 1
+        delta += ((x < m) - (y < m)) * FACTORIALS[size - 1 - k]
+    after_x = after_y = 0
+    for m in board[b + 1:]:
+        if m < x:
+            after_x += 1
+        if m < y:
+            after_y += 1
+    # new minus old digits at the positions a and b
+    delta += (between_y + (x < y) + after_y - between_x - (y < x) - after_x)\
+        * FACTORIALS[size - 1 - a]
+    delta += (after_x - after_y) * FACTORIALS[size - 1 - b]
+    return index + delta
+
+
+def build(side, goal):
+    """breadth-first search from the goal over all reachable configurations
+
+    Returns
+    -------
+    bytearray
+        distance for every rank, UNREACHABLE for the other parity
+    """
+    neighbours = grid_neighbours(side)
+    table = bytearray([UNREACHABLE]) * math.factorial(side * side)
+    board = list(goal)
+    index = rank(board)
+    table[index] = 0
+    layer = [(tuple(board), index)]
+    depth = 0
+    while layer:
+        depth += 1
+        next_layer = []
+        for board, index in layer:
+            zero = board.index(0)
+            for new_zero in neighbours[zero]:
+                new_index = swapped_rank(board, index, zero, new_zero)
+                if table[new_index] == UNREACHABLE:
+                    table[new_index] = depth
+                    new_board = list(board)
+                    new_board[zero], new_board[new_zero] =\
+                        new_board[new_zero], 0
+                    next_layer.append((tuple(new_board), new_index))
+        layer = next_layer
+    return table
+
+
+def save(path, side, goal, table):
+    write_atomic(path, [struct.pack("<4sB", MAGIC, side) + bytes(goal),
+                        table])
+
+
+def default_path(side, goal):
+    return os.path.join(TABLES_DIR, "distances_{0}x{0}_{1}.bin".format(
+        side, zero_name(goal)))
+
+
+def load(side, goal, path=None):
+    """distance table for the goal, built and saved if it does not exist
+
+    Thread-safe, threads of a process build or load a table once;
+    processes which do not find the file at the same time all build it,
+    see patterndb.write_atomic().
+
+    Returns
+    -------
+    DistanceTable
+    """
+    if path is None:
+        path = default_path(side, goal)
+    with _loaded_lock:
+        if path not in _loaded:
+            if not os.path.exists(path):
+                save(path, side, goal, build(side, goal))
+            _loaded[path] = DistanceTable(path)
+        table = _loaded[path]
+    # checked on every call, the cached file may be asked for another goal
+    if table.side != side or table.goal != list(goal):
+        raise ValueError("{} is built for another goal".format(path))
+    return table
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description="build the perfect distance table of the 3x3 puzzle")
+    parser.add_argument("-zl", "--zerolast", action='store_true',
+                        help="zero is the last element of the goal")
+    parser.add_argument("-o", "--output", default=None,
+                        help="file name, default in the tables directory")
+    args = parser.parse_args()
+
+    goal = list(range(1, 9)) + [0] if args.zerolast else list(range(9))
+    path = args.output or default_path(3, goal)
+    save(path, 3, goal, build(3, goal))
+    print("saved to", path)
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""Breadth-first search with the layers on disk
+
+Every layer is a file of sorted, distinct records: the packed
+configuration (see search.pack) shifted left by the bits of the index of
+the zero element, with the index in the low bits, stored big-endian with
+a fixed width, so the order of the bytes is the order of the records.
+
+A layer is read in chunks and its children are collected in a buffer of
+at most ``memory_mb`` megabytes. A full buffer is sorted, cleared of
+duplicates and written to a run file. The runs (at most ``FAN_IN`` at
+once, more runs are merged in several passes) are merged into the next
+layer, skipping the records of the layer before the expanded one: the
+move graph is undirected, so a child of layer d lies in layer d - 1,
+d or d + 1, and bipartite, so it is never in layer d itself. Memory does
+not depend on the size of the layers.
+
+The path is restored backwards from the goal: for every layer, from the
+last one, a neighbour of the current record is looked up in the layer
+file with a binary search.
+"""
+import argparse
+import heapq
+import os
+import tempfile
+import time
+
+from search import DIRECTIONS, OPPOSITE, context, move_table
+
+# maximum number of files merged at once
+FAN_IN = 64
+# records read from a file at once
+CHUNK = 4096
+# bytes of one buffered child: int object and list slot
+STATE_BYTES = 48
+
+
+class _Layers():
+    """record format and files of one search"""
+
+    def __init__(self, directory, side, shifts, mask):
+        self.directory = directory
+        self.shifts = shifts
+        self.mask = mask
+        self.zero_bits = (side * side - 1).bit_length()
+        self.zero_mask = (1 << self.zero_bits) - 1
+        self.width = (side * side * mask.bit_length() + self.zero_bits + 7)\
+            // 8
+        self.moves = move_table(side)
+        self._runs = 0
+
+    def record(self, key):
+        """record of a packed configuration"""
+        for zero, shift in enumerate(self.shifts):
+            # the zero element has the code 0
+            if not (key >> shift) & self.mask:
+                return key << self.zero_bits | zero
+
+    def layer(self, depth):
+        return os.path.join(self.directory, "layer_{}".format(depth))
+
+    def run(self):
+        """name of a new run file"""
+        self._runs += 1
+        return os.path.join(self.directory, "run_{}".format(self._runs))
+
+    def children(self, record):
+        """generator of (direction, child record)"""
+        zero = record & self.zero_mask
+        key = record >> self.zero_bits
+        shifts = self.shifts
+        for direction, new_zero, _ in self.moves[zero]:
+            code = (key >> shifts[new_zero]) & self.mask
+            yield direction, (key + (code << shifts[zero]) -
+                              (code << shifts[new_zero])) << self.zero_bits\
+                | new_zero
+
+    def read(self, path, io):
+        """generator of the records of a file, counts the bytes in io"""
+        width = self.width
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(width * CHUNK)
+                if not data:
+                    return
+                io["read"] += len(data)
+                for i in range(0, len(data), width):
+                    yield int.from_bytes(data[i:i + width], "big")
+
+    def write(self, path, records, io):
+        """write sorted records without repeats
+
+        Returns
+        -------
+        int
+            number of the records written
+        """
+        width = self.width
+        count = 0
+        previous = None
+        chunk = []
+        with open(path, "wb") as f:
+            for record in records:
+                if record == previous:
+                    continue
+                previous = record
+                chunk.append(record.to_bytes(width, "big"))
+                if len(chunk) == CHUNK:
+                    count += self._flush(f, chunk, io)
+            count += self._flush(f, chunk, io)
+        return count
+
+    def _flush(self, f, chunk, io):
+        data = b"".join(chunk)
+        f.write(data)
+        io["written"] += len(data)
+        chunk.clear()
+        return len(data) // self.width
+
+    def contains(self, path, record, io):
+        """binary search of a record in a layer file"""
+        width = self.width
+        low, high = 0, os.path.getsize(path) // width
+        with open(path, "rb") as f:
+            while low < high:
+                middle = (low + high) // 2
+                f.seek(middle * width)
+                io["read"] += width
+                value = int.from_bytes(f.read(width), "big")
+                if value == record:
+                    return True
+                if value < record:
+                    low = middle + 1
+                else:
+                    high = middle
+        return False
+
+
+def _difference(records, removed):
+    """sorted records which are not in the sorted iterator removed"""
+    removed = iter(removed)
+    other = next(removed, None)
+    for record in records:
+        while other is not None and other < record:
+            other = next(removed, None)
+        if record != other:
+            yield record
+
+
+def _merge(layers, runs, io):
+    """merge the runs until at most FAN_IN are left"""
+    while len(runs) > FAN_IN:
+        merged = []
+        for i in range(0, len(runs), FAN_IN):
+            group = runs[i:i + FAN_IN]
+            path = layers.run()
+            layers.write(path, heapq.merge(*(layers.read(run, io)
+                                             for run in group)), io)
+            for run in group:
+                os.remove(run)
+            merged.append(path)
+        runs = merged
+    return runs
+
+
+def bfs(key, goal, side, shifts, mask, maxnodes, memory_mb=256,
+        scratch_dir=None):
+    """breadth-first search from the packed configuration key to goal
+
+    Parameters
+    ----------
+    key : int
+        packed initial configuration
+    goal : int or None
+        packed goal configuration, None to search the whole state space
+    side : int
+        side of the board
+    shifts : list[int]
+        bit offsets of the positions in a packed configuration
+    mask : int
+        mask of one tile code
+    maxnodes : int
+        maximum number of nodes to expand, only whole layers are
+        expanded
+    memory_mb : float
+        size of the buffer of the children in megabytes, default 256
+    scratch_dir : str, optional
+        directory of the layer files, by default the system temporary
+        directory; the files are removed at the end
+
+    Returns
+    -------
+    tuple(list[str] or None, int, int, list[dict])
+        moves to the goal (None if not found), expanded nodes, depth of
+        the last layer and for every layer its depth, number of states,
+        number of run files and bytes read and written to make it
+    """
+    capacity = max(CHUNK, int(memory_mb * 2**20) // STATE_BYTES)
+    with tempfile.TemporaryDirectory(prefix="ebfs_", dir=scratch_dir)\
+            as directory:
+        layers = _Layers(directory, side, shifts, mask)
+        start = layers.record(key)
+        target = None if goal is None else layers.record(goal)
+        io = {"depth": 0, "states": 1, "runs": 0, "read": 0, "written": 0,
+              "time": 0.0}
+        layers.write(layers.layer(0), [start], io)
+        stats = [io]
+        nodes = 0
+        depth = 0
+        found = start == target
+        while not found and stats[-1]["states"]:
+            if nodes + stats[-1]["states"] > maxnodes:
+                return None, nodes, depth, stats
+            nodes += stats[-1]["states"]
+            depth += 1
+            begin = time.perf_counter()
+            io = {"depth": depth, "states": 0, "runs": 0, "read": 0,
+                  "written": 0}
+            runs = []
+            buffer = []
+            for record in layers.read(layers.layer(depth - 1), io):
+                for _, child in layers.children(record):
+                    buffer.append(child)
+                if len(buffer) >= capacity:
+                    buffer.sort()
+                    runs.append(layers.run())
+                    layers.write(runs[-1], buffer, io)
+                    buffer.clear()
+            if buffer:
+                buffer.sort()
+                runs.append(layers.run())
+                layers.write(runs[-1], buffer, io)
+            buffer = []
+            io["runs"] = len(runs)
+            runs = _merge(layers, runs, io)
+            children = heapq.merge(*(layers.read(run, io) for run in runs))
+            if depth >= 2:
+                children = _difference(
+                    children, layers.read(layers.layer(depth - 2), io))
+            io["states"] = layers.write(layers.layer(depth), children, io)
+            for run in runs:
+                os.remove(run)
+            if target is not None:
+                found = layers.contains(layers.layer(depth), target, io)
+            io["time"] = round(time.perf_counter() - begin, 6)
+            stats.append(io)
+        if not stats[-1]["states"]:
+            # the whole state space is searched
+            stats.pop()
+            depth -= 1
+        if not found:
+            return None, nodes, depth, stats
+        moves = []
+        record = target
+        for previous in range(depth - 1, -1, -1):
+            for direction, child in layers.children(record):
+                if layers.contains(layers.layer(previous), child, io):
+                    moves.append(OPPOSITE[DIRECTIONS[direction]])
+                    record = child
+                    break
+        return moves[::-1], nodes, depth, stats
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description="count the states of every breadth-first layer from\
+        the goal on disk")
+    parser.add_argument("side", type=int, help="side of the board")
+    parser.add_argument("-zl", "--zerolast", action='store_true',
+                        help="zero is the last element of the goal")
+    parser.add_argument("-m", "--memory-mb", type=float, default=256,
+                        help="buffer size in megabytes, default 256")
+    parser.add_argument("-d", "--scratch-dir", default=None,
+                        help="directory of the layer files, default the\
+                        system temporary directory")
+    parser.add_argument("-n", "--nodes", type=float, default=float("inf"),
+                        help="maximum number of nodes to expand, default\
+                        no limit")
+    args = parser.parse_args()
+
+    size = args.side * args.side
+    goal = context(list(range(1, size)) + [0] if args.zerolast
+                   else list(range(size)))
+    _, nodes, depth, stats = bfs(goal.goal_key, None, args.side, goal.shifts,
+                                 goal.mask, args.nodes, args.memory_mb,
+                                 args.scratch_dir)
+    for layer in stats:
+        print(layer)
+    print("states:", sum(layer["states"] for layer in stats),
+          "depth:", depth)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""Hash-distributed parallel A* (HDA*)
+
+Every state is owned by one worker process, chosen by a hash of its
+packed configuration. A worker keeps its own open list (heap) and the
+best known depth, parent and direction of its states. The children it
+generates are scored incrementally by the heuristic and sent in batches
+to their owners through multiprocessing queues.
+
+The cost of the best solution found so far is shared by all the workers,
+and nodes with f = depth + distance not smaller than it are pruned. Since
+the heuristic is admissible the solution is optimal once all the workers
+are idle and no batch is in flight. The coordinator detects this by
+taking two equal snapshots of the idle flags and of the sent and received
+batch counters. The path is then traced back by asking the owner of every
+state for its parent.
+
+Run as a script to compare the speed with the serial ast method.
+"""
+import argparse
+import heapq
+import os
+import queue
+import time
+from multiprocessing import Array, Process, Queue, Value
+
+from heuristics import HEURISTICS
+from search import OPPOSITE, PackedBoard, Solver, neighbours
+
+BATCH = 64
+# how far beyond the smallest f of all the open lists a worker may expand
+SLACK = 0
+INFINITY = 2**31 - 1
+
+
+def owner(key, workers):
+    """worker owning the packed configuration (Fibonacci hashing)"""
+    return (((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32)\
+        % workers
+
+
+def _worker(index, workers, board, goal, heuristic, options, inboxes,
+            replies, cost, frontier, idle, sent, received, expanded):
+    """the loop of one worker process
+
+    Messages in the inbox:
+        ("nodes", [(key, zero, depth, dist, hdata, parent, direction)])
+        ("trace", key) - reply (parent, direction) of the state
+        ("stop", None) - reply (expanded nodes, max depth) and exit
+    """
+    solver = Solver("ast", board, goal=goal, heuristic=heuristic, **options)
+    update = solver.heuristic.update
+    goal = solver.goal
+    context = solver.context
+    inbox = inboxes[index]
+    open_list = []
+    # packed configuration -> (depth, parent, direction)
+    best = {}
+    outgoing = [[] for _ in range(workers)]
+    nodes = 0
+    max_depth = 0
+
+    def push(node):
+        key, zero, depth, dist, hdata, parent, direction = node
+        if key in best and best[key][0] <= depth:
+            return
+        best[key] = (depth, parent, direction)
+        heapq.heappush(open_list, (depth + dist, -depth, key, zero, dist,
+                                   hdata))
+
+    bound = INFINITY
+    while True:
+        while True:
+            try:
+                command, data = inbox.get_nowait()\
+                    if open_list and open_list[0][0] <= bound\
+                    else inbox.get(timeout=0.01)
+            except queue.Empty:
+                break
+            if command == "nodes":
+                idle[index] = 0
+                received[index] += 1
+                for node in data:
+                    push(node)
+            elif command == "trace":
+                replies.put(best[data][1:])
+            else:
+                replies.put((nodes, max_depth))
+                return
+            if open_list:
+                break
+
+        frontier[index] = open_list[0][0] if open_list else INFINITY
+        bound = min(frontier) + SLACK
+        incumbent = cost.value
+        for _ in range(BATCH):
+            if not open_list or open_list[0][0] > bound:
+                break
+            f, depth, key, zero, dist, hdata = heapq.heappop(open_list)
+            depth = -depth
+            if best[key][0] < depth:
+                continue
+            if f >= incumbent:
+                open_list.clear()
+                break
+            if key == goal:
+                with cost.get_lock():
+                    if depth < cost.value:
+                        cost.value = depth
+                incumbent = cost.value
+                continue
+            nodes += 1
+            if depth > max_depth:
+                max_depth = depth
+            previous = OPPOSITE.get(best[key][2])
+            for direction, new_key, new_zero in neighbours(key, zero,
+                                                             context):
+                if direction == previous:
+                    continue
+                child = PackedBoard(new_key, context)
+                new_dist, new_hdata = update(dist, hdata, child, child[zero],
+                                             new_zero, zero)
+                if depth + 1 + new_dist >= incumbent:
+                    continue
+                node = (new_key, new_zero, depth + 1, new_dist, new_hdata,
+                        key, direction)
+                destination = owner(new_key, workers)
+                if destination == index:
+                    push(node)
+                else:
+                    outgoing[destination].append(node)
+        expanded[index] = nodes
+        frontier[index] = open_list[0][0] if open_list else INFINITY
+
+        for destination, batch in enumerate(outgoing):
+            if batch:
+                # the owner publishes its own minimum once it gets the
+                # batch, until then nobody should run ahead of it
+                low = min(node[2] + node[3] for node in batch)
+                if low < frontier[destination]:
+                    frontier[destination] = low
+                sent[index] += 1
+                inboxes[destination].put(("nodes", batch))
+                outgoing[destination] = []
+        if not open_list:
+            idle[index] = 1
+
+
+def search(board, zl=False, heuristic="manhattan", workers=None,
+           maxnodes=500000, goal=None, **options):
+    """hash-distributed A* in a pool of worker processes
+
+    Parameters
+    ----------
+    board : list[int]
+        initial tiles configuration
+    zl : bool
+        True if zero is the last element of the goal
+    heuristic : str
+        name of the heuristic, see heuristics.HEURISTICS
+    workers : int, optional
+        number of processes, by default the number of CPUs
+    maxnodes : int
+        maximum number of expanded nodes of all the workers
+    goal : list[int], optional
+        goal tiles configuration, replaces zl
+    options : dict
+        keyword arguments of the heuristic (pdb_path)
+
+    Returns
+    -------
+    tuple(list[str] or None, int, int)
+        optimal moves (None if not found), expanded nodes and
+        maximum depth
+    """
+    workers = workers or os.cpu_count()
+    solver = Solver("ast", board, zl=zl, goal=goal, heuristic=heuristic,
+                    **options)
+    start = solver.initial_state
+    # relabeled for the canonical goal
+    board = start.state
+    inboxes = [Queue() for _ in range(workers)]
+    replies = Queue()
+    cost = Value("l", INFINITY)
+    # the smallest f of every open list
+    frontier = Array("l", [INFINITY] * workers, lock=False)
+    # the last element of the counters is the coordinator
+    idle = Array("b", workers, lock=False)
+    sent = Array("q", workers + 1, lock=False)
+    received = Array("q", workers, lock=False)
+    expanded = Array("q", workers, lock=False)
+    processes = [Process(target=_worker,
+                         args=(i, workers, board, solver.goal_array,
+                               heuristic, options, inboxes, replies, cost,
+                               frontier, idle, sent, received, expanded),
+                         daemon=True)
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+
+    dist, hdata = solver.heuristic.evaluate(board)
+    sent[workers] += 1
+    inboxes[owner(start.key, workers)].put(
+        ("nodes", [(start.key, start.zero_index, 0, dist, hdata, None, '')]))
+    previous = None
+    while True:
+        time.sleep(0.002)
+        if sum(expanded) > maxnodes:
+            break
+        snapshot = (all(idle), sum(sent), sum(received))
+        if snapshot[0] and snapshot[1] == snapshot[2] and\
+                snapshot == previous:
+            break
+        previous = snapshot
+
+    moves = None
+    if sum(expanded) <= maxnodes and cost.value < INFINITY:
+        moves = []
+        key = solver.goal
+        while key != start.key:
+            inboxes[owner(key, workers)].put(("trace", key))
+            key, direction = replies.get()
+            moves.append(direction)
+        moves.reverse()
+    for inbox in inboxes:
+        inbox.put(("stop", None))
+    nodes, max_depth = 0, 0
+    for _ in processes:
+        worker_nodes, worker_depth = replies.get()
+        nodes += worker_nodes
+        max_depth = max(max_depth, worker_depth)
+    for process in processes:
+        process.join()
+    return moves, nodes, max_depth
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description="speed of the parallel A* against the serial ast")
+    parser.add_argument("initial", nargs="?",
+                        default="1,2,3,4,13,9,14,5,12,10,15,0,11,8,7,6",
+                        help="initial state in format: 0,1,2,3 etc,\
+                        default the 4x4 example from the tests")
+    parser.add_argument("-w", "--workers", default="1,2,4,8",
+                        help="comma-separated numbers of workers")
+    parser.add_argument("-zl", "--zerolast", action='store_true',
+                        help="zero is the last element of the goal")
+    parser.add_argument("-H", "--heuristic", default="manhattan",
+                        choices=list(HEURISTICS),
+                        help="distance estimate, default manhattan")
+    parser.add_argument("-n", "--nodes", default='5000000',
+                        help="maximum number of nodes to visit")
+    args = parser.parse_args()
+
+    board = list(map(int, args.initial.split(",")))
+    solver = Solver("ast", board, zl=args.zerolast, heuristic=args.heuristic)
+    solver.solve(maxnodes=int(args.nodes))
+    serial = solver.statistics.total_time
+    print("ast: {} moves, {} nodes, {} s".format(
+        len(solver.statistics.moves), solver.statistics.nodes,
+        round(serial, 3)))
+    for workers in map(int, args.workers.split(",")):
+        start = time.time()
+        moves, nodes, _ = search(board, args.zerolast, args.heuristic,
+                                 workers, int(args.nodes))
+        elapsed = time.time() - start
+        print("hdastar, {} workers: {} moves, {} nodes, {} s, speedup {}"
+              .format(workers, len(moves) if moves is not None else None,
+                      nodes, round(elapsed, 3), round(serial / elapsed, 2)))
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""Distance estimates to the goal for the ast and idastar methods
+
+Every heuristic evaluates a whole board once (for the initial state) and
+then updates the value after each move, looking only at the moved tile
+and at most one row or column. Besides the value a heuristic may keep a
+small ``data`` object per state (e.g. the walking distance table
+indexes), which the search stores in the node and passes back.
+
+A board is anything indexable by position: a list or search.PackedBoard.
+"""
+import argparse
+import threading
+
+import patterndb
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+class Heuristic():
+    """base class of the heuristics
+
+    Arguments
+    ----------
+    side : int
+        side of the board
+    goal : list[int]
+        goal tiles configuration
+
+    Attributes
+    ----------
+        name : str
+            name used in Solver and in the command line
+        goal_coords : list[tuple(int, int)]
+            row and column of every tile in the goal
+        delta : list[list[int]] or None
+            if the change of the value after a move depends only on the
+            tile and the move, ``delta[tile][src * 4 + direction]`` is the
+            change after the move of the tile from src in the direction
+            "UDLR"[direction], and ast adds it instead of calling update()
+    """
+    name = ""
+    delta = None
+
+    def __init__(self, side, goal):
+        self.side = side
+        self.goal = list(goal)
+        self.goal_coords = [None] * len(goal)
+        for i, tile in enumerate(goal):
+            self.goal_coords[tile] = divmod(i, side)
+
+    def evaluate(self, board):
+        """full evaluation of the board
+
+        Returns
+        -------
+        tuple(int, object)
+            distance estimate and the data for update()
+        """
+        raise NotImplementedError
+
+    def update(self, distance, data, board, tile, src, dst):
+        """value after a move of ``tile`` from ``src`` to ``dst``
+
+        Parameters
+        ----------
+        distance : int
+            value of the parent state
+        data : object
+            data of the parent state
+        board : list[int] or PackedBoard
+            configuration after the move
+        tile : int
+            moved tile
+        src, dst : int
+            positions of the tile before and after the move
+
+        Returns
+        -------
+        tuple(int, object)
+            value and data of the new state
+        """
+        raise NotImplementedError
+
+
+class Manhattan(Heuristic):
+    """sum of the Manhattan distances of the tiles to their goal cells"""
+    name = "manhattan"
+
+    def __init__(self, side, goal):
+        super().__init__(side, goal)
+        self.table = [[0] * len(goal) for _ in goal]
+        for tile in range(1, len(goal)):
+            goal_row, goal_col = self.goal_coords[tile]
+            for pos in range(len(goal)):
+                self.table[tile][pos] = abs(goal_row - pos // side) +\
+                    abs(goal_col - pos % side)
+        self.delta = [[0] * (4 * len(goal)) for _ in goal]
+        for tile in range(1, len(goal)):
+            table = self.table[tile]
+            for src in range(len(goal)):
+                for direction, dst in enumerate((src - side, src + side,
+                                                 src - 1, src + 1)):
+                    if 0 <= dst < len(goal) and\
+                            (direction < 2 or dst // side == src // side):
+                        self.delta[tile][src * 4 + direction] =\
+                            table[dst] - table[src]
+
+    def evaluate(self, board):
+        return sum(self.table[tile][pos]
+                   for pos, tile in enumerate(board)), None
+
+    def update(self, distance, data, board, tile, src, dst):
+        table = self.table[tile]
+        return distance + table[dst] - table[src], None
+
+
+class LinearConflict(Manhattan):
+    """Manhattan distance plus two moves for every tile which has to leave
+    its goal row (column) to let other tiles of this row pass
+
+    A horizontal move keeps the order of tiles in the row, so only the
+    column of the moved tile's goal can change, and the other way round
+    for vertical moves.
+    """
+    name = "linear_conflict"
+
+    def __init__(self, side, goal):
+        super().__init__(side, goal)
+        # the conflicts depend on the other tiles of the line
+        self.delta = None
+        self._lines = ([[r*side + c for c in range(side)]
+                        for r in range(side)],
+                       [[r*side + c for r in range(side)]
+                        for c in range(side)])
+        self._conflicts = {}
+
+    def _line(self, tiles, axis, line):
+        """number of tiles to remove from the line (row if axis is 0) so
+        that the rest of its goal tiles are in the goal order"""
+        order = tuple(self.goal_coords[t][1 - axis] for t in tiles
+                      if t and self.goal_coords[t][axis] == line)
+        if order not in self._conflicts:
+            longest = [1] * len(order)
+            for i in range(len(order)):
+                for j in range(i):
+                    if order[j] < order[i] and longest[j] + 1 > longest[i]:
+                        longest[i] = longest[j] + 1
+            self._conflicts[order] = len(order) - max(longest, default=0)
+        return self._conflicts[order]
+
+    def evaluate(self, board):
+        distance, _ = super().evaluate(board)
+        for axis in (0, 1):
+            for line, cells in enumerate(self._lines[axis]):
+                distance += 2 * self._line([board[p] for p in cells],
+                                           axis, line)
+        return distance, None
+
+    def update(self, distance, data, board, tile, src, dst):
+        table = self.table[tile]
+        distance += table[dst] - table[src]
+        # a horizontal move changes the columns, a vertical one the rows
+        axis = 1 if src // self.side == dst // self.side else 0
+        line = self.goal_coords[tile][axis]
+        if line != divmod(src, self.side)[axis] and\
+                line != divmod(dst, self.side)[axis]:
+            return distance, None
+        cells = self._lines[axis][line]
+        after = [board[p] for p in cells]
+        before = [tile if p == src else 0 if p == dst else t
+                  for p, t in zip(cells, after)]
+        return distance + 2 * (self._line(after, axis, line) -
+                               self._line(before, axis, line)), None
+
+
+class WalkingDistance(Heuristic):
+    """walking distance: the moves needed if tiles could only be told
+    apart by their goal row, plus the same for columns
+
+    A state of a table is the matrix of counts of tiles in every row with
+    every goal row and the row of the empty tile. The tables are built
+    with a breadth-first search from the goal and shared between
+    instances. The data of a board state are the indexes of its row and
+    column states, so a move is one table lookup.
+    """
+    name = "walking_distance"
+    _tables = {}
+
+    def __init__(self, side, goal):
+        super().__init__(side, goal)
+        self._rows = self._table(0)
+        self._cols = self._table(1)
+        self._count = len(self._cols[0])
+
+    def _table(self, axis):
+        """distances and transitions for the lines along axis
+
+        Returns
+        -------
+        tuple(list[int], list[list[int]], list[list[int]], dict)
+            distance of every state, the states after the empty tile
+            moves to the lower or upper line with a tile of given goal
+            line, and the index of every state
+        """
+        side = self.side
+        goal_matrix = [[0] * side for _ in range(side)]
+        blank = self.goal_coords[0][axis]
+        for tile in range(1, len(self.goal)):
+            line = self.goal_coords[tile][axis]
+            goal_matrix[line][line] += 1
+        start = (tuple(map(tuple, goal_matrix)), blank)
+        if (side, start) in self._tables:
+            return self._tables[(side, start)]
+
+        index = {start: 0}
+        states = [start]
+        distances = [0]
+        i = 0
+        while i < len(states):
+            matrix, blank = states[i]
+            for other in (blank - 1, blank + 1):
+                if not 0 <= other < side:
+                    continue
+                for goal_line in range(side):
+                    if matrix[other][goal_line]:
+                        new = [list(row) for row in matrix]
+                        new[other][goal_line] -= 1
+                        new[blank][goal_line] += 1
+                        state = (tuple(map(tuple, new)), other)
+                        if state not in index:
+                            index[state] = len(states)
+                            states.append(state)
+                            distances.append(distances[i] + 1)
+            i += 1
+
+        to_lower = [[-1] * side for _ in states]
+        to_upper = [[-1] * side for _ in states]
+        for i, (matrix, blank) in enumerate(states):
+            for other, moves in ((blank - 1, to_lower), (blank + 1, to_upper)):
+                if not 0 <= other < side:
+                    continue
+                for goal_line in range(side):
+                    if matrix[other][goal_line]:
+                        new = [list(row) for row in matrix]
+                        new[other][goal_line] -= 1
+                        new[blank][goal_line] += 1
+                        moves[i][goal_line] = index[(tuple(map(tuple, new)),
+                                                     other)]
+        table = (distances, to_lower, to_upper, index)
+        self._tables[(side, start)] = table
+        return table
+
+    def _state(self, board, axis):
+        side = self.side
+        matrix = [[0] * side for _ in range(side)]
+        for pos, tile in enumerate(board):
+            if tile:
+                matrix[divmod(pos, side)[axis]][
+                    self.goal_coords[tile][axis]] += 1
+            else:
+                blank = divmod(pos, side)[axis]
+        table = self._rows if axis == 0 else self._cols
+        return table[3][(tuple(map(tuple, matrix)), blank)]
+
+    def evaluate(self, board):
+        row = self._state(board, 0)
+        col = self._state(board, 1)
+        return self._rows[0][row] + self._cols[0][col],\
+            row * self._count + col
+
+    def update(self, distance, data, board, tile, src, dst):
+        row, col = divmod(data, self._count)
+        if src // self.side == dst // self.side:
+            moves = self._cols[1] if src < dst else self._cols[2]
+            col = moves[col][self.goal_coords[tile][1]]
+        else:
+            moves = self._rows[1] if src < dst else self._rows[2]
+            row = moves[row][self.goal_coords[tile][0]]
+        return self._rows[0][row] + self._cols[0][col],\
+            row * self._count + col
+
+
+class PatternDatabaseHeuristic(Heuristic):
+    """additive pattern databases from the patterndb module
+
+    The data of a state are the ranks of the groups, so a move re-ranks
+    only the group of the moved tile.
+
+    Arguments
+    ----------
+    pdb_path : str, optional
+        pattern database file, by default the default partition from the
+        tables directory (built if it does not exist)
+    """
+    name = "pdb"
+
+    def __init__(self, side, goal, pdb_path=None):
+        super().__init__(side, goal)
+        self.database = patterndb.load(side, self.goal, path=pdb_path)
+        self._group = [None] * len(goal)
+        for i, tiles in enumerate(self.database.groups):
+            for tile in tiles:
+                self._group[tile] = i
+
+    def evaluate(self, board):
+        ranks = self.database.ranks(board)
+        return sum(self.database.lookup(i, r) for i, r in enumerate(ranks)),\
+            ranks
+
+    def update(self, distance, data, board, tile, src, dst):
+        database = self.database
+        group = self._group[tile]
+        size = len(self.goal)
+        positions = patterndb.unrank(data[group], size,
+                                     len(database.groups[group]))
+        positions[positions.index(src)] = dst
+        new_rank = patterndb.rank(positions, size)
+        ranks = data[:group] + (new_rank,) + data[group + 1:]
+        return distance - database.lookup(group, data[group]) +\
+            database.lookup(group, new_rank), ranks
+
+
+HEURISTICS = {h.name: h for h in (Manhattan, LinearConflict, WalkingDistance,
+                                  PatternDatabaseHeuristic)}
+
+
+def get(name, side, goal, **options):
+    """heuristic instance by name, shared by the solvers with the same board
+    size and goal
+
+    Thread-safe, a heuristic is built once also when many threads ask for
+    it at the same time.
+
+    Raises
+    ------
+    ValueError
+        if the name is unknown
+    """
+    if name not in HEURISTICS:
+        raise ValueError("Unknown heuristic {}, use one of: {}"
+                         .format(name, ", ".join(HEURISTICS)))
+    key = (name, side, tuple(goal), tuple(sorted(options.items())))
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = HEURISTICS[name](side, goal, **options)
+        return _instances[key]
+
+
+def compare(boards, zl=False, method="ast", names=None, maxnodes=2000000,
+            pdb_path=None):
+    """solve every board with every heuristic
+
+    Returns
+    -------
+    dict
+        board string -> {heuristic name: Stats}
+    """
+    from search import Solver
+
+    names = names or list(HEURISTICS)
+    results = {}
+    for board in boards:
+        row = {}
+        for name in names:
+            options = {"pdb_path": pdb_path} if name == "pdb" else {}
+            solver = Solver(method, board, zl=zl, heuristic=name, **options)
+            solver.solve(maxnodes=maxnodes)
+            row[name] = solver.statistics
+        results[",".join(map(str, board))] = row
+    return results
+
+
+def print_comparison(results):
+    """print expanded nodes, path length and time for compare() results"""
+    for board, row in results.items():
+        print(board)
+        for name, stats in row.items():
+            print("    {:<17} nodes_expanded: {:<9} cost_of_path: {:<4} "
+                  "running_time: {} s".format(name, stats.nodes,
+                                              len(stats.moves),
+                                              round(stats.total_time, 3)))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description="compare expanded nodes of the heuristics")
+    parser.add_argument("initial", nargs="+",
+                        help="initial states in format: 0,1,2,3 etc")
+    parser.add_argument("-m", "--method", default="ast",
+                        help="ast or idastar, default ast")
+    parser.add_argument("-H", "--heuristics", default=",".join(HEURISTICS),
+                        help="comma-separated heuristics, default all")
+    parser.add_argument("-n", "--nodes", default='2000000',
+                        help="maximum number of nodes to visit")
+    parser.add_argument("-zl", "--zerolast", action='store_true',
+                        help="zero is the last element of the goal")
+    args = parser.parse_args()
+
+    boards = [list(map(int, s.split(","))) for s in args.initial]
+    print_comparison(compare(boards, args.zerolast, args.method,
+                             args.heuristics.split(","), int(args.nodes)))
@@ -0,0 +1,152 @@
+"""Instrumentation of the searches
+
+An ``Instrument`` is given to ``Solver(instrument=...)``. When it is not
+given the searches only test that it is None, so there is no measurable
+overhead. With an instrument
+
+- the ast method runs a variant of its loop with phase timers (expand,
+  heuristic, dedup and heap operations), exact peak sizes of the open
+  and closed lists and counts of duplicate and reopened children
+- bfs, dfs, ast, idastar and bibfs call ``tick()`` every ``every``
+  expansions: it samples the speed in nodes per second, records the list
+  sizes and calls the progress callback
+
+``profile()`` runs a function under cProfile or tracemalloc.
+"""
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+
+PHASES = ("expand", "heuristic", "dedup", "heap")
+
+
+class Instrument():
+    """timers and counters of one search
+
+    Arguments
+    ----------
+    progress : callable, optional
+        called with the dict of ``snapshot()`` every ``every`` expansions
+    every : int
+        number of expansions between the ticks, default 10000
+
+    Attributes
+    ----------
+        phases : dict
+            phase name -> seconds, filled by the ast method only
+        max_open, max_closed : int
+            peak sizes of the open and closed lists (exact for ast,
+            sampled at ticks for the other methods)
+        duplicates : int
+            children which were already in the open or closed list with
+            a path not longer than the new one
+        reopened : int
+            children which replaced an open node with a shorter path
+        samples : list[tuple(float, int, float)]
+            seconds since the start, expanded nodes and nodes per second
+            since the previous sample, at every tick
+    """
+    def __init__(self, progress=None, every=10000):
+        self.progress = progress
+        self.every = every
+        self.next_tick = every
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.max_open = 0
+        self.max_closed = 0
+        self.duplicates = 0
+        self.reopened = 0
+        self.samples = []
+        self._start = time.perf_counter()
+        self._last = (self._start, 0)
+
+    def tick(self, stats, open_size=0, closed_size=0):
+        """record a sample, called when ``stats.nodes`` reaches
+        ``next_tick``"""
+        self.next_tick = stats.nodes + self.every
+        now = time.perf_counter()
+        last_time, last_nodes = self._last
+        rate = (stats.nodes - last_nodes) / (now - last_time)\
+            if now > last_time else 0.0
+        self.samples.append((round(now - self._start, 6), stats.nodes,
+                             round(rate)))
+        self._last = (now, stats.nodes)
+        if open_size > self.max_open:
+            self.max_open = open_size
+        if closed_size > self.max_closed:
+            self.max_closed = closed_size
+        if self.progress is not None:
+            self.progress(self.snapshot(stats, open_size, closed_size))
+
+    def snapshot(self, stats, open_size=0, closed_size=0):
+        """current state of the search for the progress callback"""
+        elapsed = time.perf_counter() - self._start
+        return {"nodes": stats.nodes, "max_depth": stats.max_depth,
+                "elapsed": round(elapsed, 6),
+                "nodes_per_sec": self.samples[-1][2] if self.samples else 0,
+                "open": open_size, "closed": closed_size}
+
+    def timed(self, heuristic):
+        """the heuristic with its update() timed as the heuristic phase"""
+        return _TimedHeuristic(heuristic, self.phases)
+
+    def to_dict(self):
+        return {"phases": {k: round(v, 6) for k, v in self.phases.items()},
+                "max_open": self.max_open, "max_closed": self.max_closed,
+                "duplicates": self.duplicates, "reopened": self.reopened,
+                "samples": self.samples}
+
+
+class _TimedHeuristic():
+    """proxy of a heuristic adding the time of update() to phases"""
+
+    def __init__(self, heuristic, phases):
+        self._heuristic = heuristic
+        self._phases = phases
+
+    def update(self, *args):
+        start = time.perf_counter()
+        result = self._heuristic.update(*args)
+        self._phases["heuristic"] += time.perf_counter() - start
+        return result
+
+
+def profile(function, mode, top=20):
+    """run a function under cProfile or tracemalloc
+
+    Parameters
+    ----------
+    function : callable
+        function without arguments
+    mode : str, {"cprofile", "tracemalloc"}
+    top : int
+        number of the functions or source lines in the report
+
+    Returns
+    -------
+    tuple(object, str, dict)
+        result of the function, text report and numbers for the JSON
+        statistics (peak traced memory for tracemalloc)
+    """
+    out = io.StringIO()
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        result = profiler.runcall(function)
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative")\
+            .print_stats(top)
+        return result, out.getvalue(), {}
+    if mode == "tracemalloc":
+        tracemalloc.start()
+        try:
+            result = function()
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        for stat in snapshot.statistics("lineno")[:top]:
+            print(stat, file=out)
+        return result, out.getvalue(),\
+            {"tracemalloc_peak_mb": round(peak / 1e6, 3)}
+    raise ValueError("Unknown profiling mode {}, use cprofile or tracemalloc"
+                     .format(mode))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Load generator for server.py
+
+Opens ``concurrency`` connections, each sends one request at a time and
+waits for the response. Boards are drawn with a fixed seed from the first
+``distinct`` boards of an instance set of benchmark.py, so with few
+distinct boards many requests are merged by the server. Prints the
+latency percentiles, throughput and the counts of coalesced requests and
+errors.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+
+from benchmark import INSTANCE_SETS, read_instances
+
+
+def percentile(values, p):
+    """nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+async def _client(connect, requests, latencies, responses):
+    reader, writer = await connect()
+    try:
+        for request in requests:
+            start = time.perf_counter()
+            writer.write((json.dumps(request) + "\n").encode())
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - start)
+            responses.append(response)
+    finally:
+        writer.close()
+
+
+async def run(requests, concurrency=8, host="127.0.0.1", port=8765,
+              unix=None):
+    """send the requests over ``concurrency`` connections
+
+    Returns
+    -------
+    dict
+        number of requests, errors and coalesced responses, requests per
+        second and latency percentiles in milliseconds
+    """
+    if unix is not None:
+        def connect():
+            return asyncio.open_unix_connection(unix)
+    else:
+        def connect():
+            return asyncio.open_connection(host, port)
+    latencies = []
+    responses = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(connect, requests[i::concurrency], latencies, responses)
+        for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    report = {"requests": len(responses),
+              "errors": sum("error" in r for r in responses),
+              "coalesced": sum(bool(r.get("coalesced")) for r in responses),
+              "cached": sum(bool(r.get("cached")) for r in responses),
+              "requests_per_sec": round(len(responses) / elapsed, 1)}
+    for p in (50, 90, 99):
+        report["p{}_ms".format(p)] = round(percentile(latencies, p) * 1000,
+                                           3)
+    report["max_ms"] = round(latencies[-1] * 1000, 3) if latencies else None
+    return report
+
+
+def make_requests(count, distinct, instance_set="3x3", method="ast",
+                  seed=0, **options):
+    """``count`` requests for boards drawn from the instance set"""
+    boards = [board for _, board in read_instances(instance_set)][:distinct]
+    rnd = random.Random(seed)
+    return [dict(options, id=i, board=rnd.choice(boards), method=method)
+            for i in range(count)]
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="load generator for the\
+                                     solve service, prints latency\
+                                     percentiles")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="server address, default 127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=8765,
+                        help="TCP port, default 8765")
+    parser.add_argument("-u", "--unix", default=None,
+                        help="Unix socket path instead of the TCP port")
+    parser.add_argument("-r", "--requests", type=int, default=1000,
+                        help="number of requests, default 1000")
+    parser.add_argument("-c", "--concurrency", type=int, default=8,
+                        help="number of connections, default 8")
+    parser.add_argument("-d", "--distinct", type=int, default=35,
+                        help="number of distinct boards, default 35")
+    parser.add_argument("-s", "--set", default="3x3",
+                        choices=list(INSTANCE_SETS),
+                        help="instance set of the boards, default 3x3")
+    parser.add_argument("-m", "--method", default="ast",
+                        help="method of search, default ast")
+    parser.add_argument("-n", "--nodes", type=int, default=None,
+                        help="node limit of a request")
+    args = parser.parse_args()
+
+    options = {"maxnodes": args.nodes} if args.nodes else {}
+    requests = make_requests(args.requests, args.distinct, args.set,
+                             args.method, **options)
+    print(json.dumps(asyncio.run(run(requests, args.concurrency, args.host,
+                                     args.port, args.unix))))
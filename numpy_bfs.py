@@ -0,0 +1,109 @@
+"""Breadth-first search over whole layers with NumPy
+
+A layer is an array of packed configurations (see search.pack) and an
+array of zero element indexes. All the children of a layer are made at
+once with vectorized shifts and masks. The move graph is bipartite, so a
+child is either new or belongs to the previous layer: duplicates are
+removed with np.unique inside the layer and a sorted membership test
+against the previous layer. The children keep the order in which
+Solver.bfs would queue them, so the statistics are the same. Only the
+parent index and direction of every node are kept for earlier layers.
+
+Packed configurations must fit into 64 bits, i.e. boards up to 4x4.
+"""
+import numpy as np
+
+DIRECTIONS = "UDLR"
+SENTINEL = np.uint64(2**64 - 1)
+
+
+def _expand(keys, zeros, previous, side, shifts, mask):
+    """new children of the layer in the order of Solver.bfs
+
+    Returns
+    -------
+    tuple(np.ndarray)
+        keys, zero indexes, parent indexes and direction codes
+    """
+    size = side * side
+    valid = np.stack([zeros >= side, zeros < size - side,
+                      zeros % side != 0, zeros % side != side - 1], axis=1)
+    # row-major order: by parent, then by direction "UDLR"
+    parents, directions = np.nonzero(valid)
+    zero = zeros[parents]
+    new_zero = zero + np.array([-side, side, -1, 1])[directions]
+    key = keys[parents]
+    code = (key >> shifts[new_zero]) & mask
+    children = key + (code << shifts[zero]) - (code << shifts[new_zero])
+    unique, first = np.unique(children, return_index=True)
+    fresh = first[~np.isin(unique, previous, assume_unique=True)]
+    fresh.sort()
+    return children[fresh], new_zero[fresh], parents[fresh],\
+        directions[fresh].astype(np.uint8)
+
+
+def bfs(key, zero, goal, side, shifts, mask, maxnodes):
+    """breadth-first search from the packed configuration key to goal
+
+    Parameters
+    ----------
+    key, goal : int
+        packed initial and goal configurations
+    zero : int
+        index of the zero element in the initial configuration
+    side : int
+        side of the board
+    shifts : list[int]
+        bit offsets of the positions in a packed configuration
+    mask : int
+        mask of one tile code
+    maxnodes : int
+        maximum number of nodes to expand
+
+    Returns
+    -------
+    tuple(list[str] or None, int, int)
+        moves to the goal (None if not found), expanded nodes and
+        maximum depth like in Solver.bfs
+    """
+    if mask.bit_length() * side * side > 64:
+        raise ValueError("NumPy search works only for boards up to 4x4")
+    shifts = np.array(shifts, dtype=np.uint64)
+    mask = np.uint64(mask)
+    keys = np.array([key], dtype=np.uint64)
+    zeros = np.array([zero], dtype=np.int64)
+    previous = np.empty(0, dtype=np.uint64)
+    layers = []
+    expanded = 0
+    max_depth = 0
+    while len(keys):
+        found = np.flatnonzero(keys == np.uint64(goal))
+        if not len(found) and expanded + len(keys) <= maxnodes:
+            expanded += len(keys)
+            new_keys, zeros, parents, directions = _expand(
+                keys, zeros, previous, side, shifts, mask)
+            if len(new_keys):
+                max_depth += 1
+            layers.append((parents, directions))
+            previous = np.sort(keys)
+            keys = new_keys
+            continue
+        # the search ends in this layer, at the goal or at maxnodes;
+        # children of the nodes expanded before are already queued
+        if len(found) and expanded + int(found[0]) <= maxnodes:
+            index = int(found[0])
+        else:
+            index = None
+        limit = maxnodes - expanded if index is None else index
+        _, _, parents, _ = _expand(keys, zeros, previous, side, shifts, mask)
+        if len(parents) and parents[0] < limit:
+            max_depth += 1
+        if index is None:
+            return None, maxnodes + 1, max_depth
+        nodes = expanded + index
+        moves = []
+        for parents, directions in reversed(layers):
+            moves.append(DIRECTIONS[directions[index]])
+            index = int(parents[index])
+        return moves[::-1], nodes, max_depth
+    return None, expanded, max_depth
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""Additive disjoint pattern databases
+
+The tiles 1..n-1 are split into disjoint groups. For every group a table
+holds the minimal number of moves of the group tiles needed to bring them
+to their goal positions, whatever the other tiles are. Moves of the other
+tiles are free, so the values of different groups can be summed and the
+sum is still an admissible heuristic.
+
+Tables are built once with a retrograde breadth-first search from the
+goal and written to a binary file::
+
+    magic "PDB1", side, number of groups, goal array,
+    then for every group: size, tiles, offset of its table in the file
+
+Each table has one byte per placement of the group tiles, indexed by the
+rank of the partial permutation of their positions. Files are opened with
+mmap, so all the solver processes share one copy in the page cache.
+"""
+import argparse
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import zlib
+
+MAGIC = b"PDB1"
+TABLES_DIR = os.environ.get(
+    "PUZZLE_TABLES", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "tables"))
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+class PatternDatabase():
+    """a set of additive pattern database tables mapped from a file
+
+    Arguments
+    ----------
+    path : str
+        file written by save()
+
+    Attributes
+    ----------
+        side : int
+            side of the board
+        goal : list[int]
+            goal tiles configuration the tables were built for
+        groups : list[list[int]]
+            tiles of every group
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.side, count = struct.unpack_from("<4sBB", self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError("{} is not a pattern database file".format(path))
+        size = self.side * self.side
+        offset = 6
+        self.goal = list(self._mm[offset:offset + size])
+        offset += size
+        self.groups = []
+        self._offsets = []
+        for _ in range(count):
+            k = self._mm[offset]
+            self.groups.append(list(self._mm[offset + 1:offset + 1 + k]))
+            self._offsets.append(
+                struct.unpack_from("<Q", self._mm, offset + 1 + k)[0])
+            offset += 9 + k
+
+    def distance(self, board):
+        """sum of the group tables for the board
+
+        Parameters
+        ----------
+        board : list[int]
+            tiles configuration
+
+        Returns
+        -------
+        int
+            admissible estimate of the number of moves to the goal
+        """
+        return sum(self.lookup(i, r)
+                   for i, r in enumerate(self.ranks(board)))
+
+    def ranks(self, board):
+        """ranks of the positions of every group tiles
+
+        Returns
+        -------
+        tuple(int)
+        """
+        where = [0] * len(board)
+        for i, tile in enumerate(board):
+            where[tile] = i
+        return tuple(rank([where[t] for t in tiles], len(board))
+                     for tiles in self.groups)
+
+    def lookup(self, group, index):
+        """value of the group table for the rank of the tiles positions"""
+        return self._mm[self._offsets[group] + index]
+
+    def close(self):
+        self._mm.close()
+
+
+def rank(positions, size):
+    """index of the partial permutation of ``positions`` among ``size`` cells
+
+    Returns
+    -------
+    int
+        number in range(size!/(size-k)!), k = len(positions)
+    """
+    index = 0
+    for i, p in enumerate(positions):
+        smaller = 0
+        for q in positions[:i]:
+            if q < p:
+                smaller += 1
+        index = index * (size - i) + p - smaller
+    return index
+
+
+def unrank(index, size, k):
+    """inverse of rank()"""
+    digits = [0] * k
+    for i in range(k - 1, -1, -1):
+        index, digits[i] = divmod(index, size - i)
+    free = list(range(size))
+    return [free.pop(d) for d in digits]
+
+
+def permutations_count(size, k):
+    count = 1
+    for i in range(k):
+        count *= size - i
+    return count
+
+
+def grid_neighbours(side):
+    """list of the adjacent cells for every cell of the board"""
+    neighbours = []
+    for i in range(side * side):
+        row, col = divmod(i, side)
+        cells = []
+        if row > 0:
+            cells.append(i - side)
+        if row < side - 1:
+            cells.append(i + side)
+        if col > 0:
+            cells.append(i - 1)
+        if col < side - 1:
+            cells.append(i + 1)
+        neighbours.append(cells)
+    return neighbours
+
+
+def _region(start, occupied, neighbours):
+    """cells reachable by the empty tile from start without moving a
+    group tile"""
+    region = {start}
+    stack = [start]
+    while stack:
+        cell = stack.pop()
+        for q in neighbours[cell]:
+            if q not in region and not occupied[q]:
+                region.add(q)
+                stack.append(q)
+    return region
+
+
+def build_table(side, goal, tiles):
+    """retrograde breadth-first search for one group
+
+    The abstract state is the placement of the group tiles and the region
+    of cells the empty tile can reach without moving them (represented by
+    its smallest cell). Only moves of the group tiles are counted.
+
+    Parameters
+    ----------
+    side : int
+        side of the board
+    goal : list[int]
+        goal tiles configuration
+    tiles : list[int]
+        tiles of the group
+
+    Returns
+    -------
+    bytearray
+        distance for every rank of the group tiles positions
+    """
+    size = side * side
+    k = len(tiles)
+    neighbours = grid_neighbours(side)
+    count = permutations_count(size, k)
+    table = bytearray(b"\xff") * count
+    seen = bytearray(count * size)
+
+    positions = [goal.index(t) for t in tiles]
+    occupied = [False] * size
+    for p in positions:
+        occupied[p] = True
+    start_rank = rank(positions, size)
+    start = start_rank * size +\
+        min(_region(goal.index(0), occupied, neighbours))
+    seen[start] = 1
+    table[start_rank] = 0
+    layer = [start]
+    depth = 0
+    while layer:
+        depth += 1
+        next_layer = []
+        for state in layer:
+            index, blank = divmod(state, size)
+            positions = unrank(index, size, k)
+            occupied = [False] * size
+            for p in positions:
+                occupied[p] = True
+            region = _region(blank, occupied, neighbours)
+            for i, p in enumerate(positions):
+                for q in neighbours[p]:
+                    if q not in region:
+                        continue
+                    positions[i] = q
+                    occupied[p], occupied[q] = False, True
+                    new_rank = rank(positions, size)
+                    new_state = new_rank * size +\
+                        min(_region(p, occupied, neighbours))
+                    occupied[p], occupied[q] = True, False
+                    positions[i] = p
+                    if not seen[new_state]:
+                        seen[new_state] = 1
+                        next_layer.append(new_state)
+                        if table[new_rank] == 255:
+                            table[new_rank] = depth
+        layer = next_layer
+    return table
+
+
+def save(path, side, goal, groups, tables):
+    """write the tables to a pattern database file"""
+    header = struct.pack("<4sBB", MAGIC, side, len(groups)) + bytes(goal)
+    offset = len(header) + sum(9 + len(tiles) for tiles in groups)
+    for tiles, table in zip(groups, tables):
+        header += struct.pack("<B", len(tiles)) + bytes(tiles) +\
+            struct.pack("<Q", offset)
+        offset += len(table)
+    write_atomic(path, [header] + list(tables))
+
+
+def write_atomic(path, chunks):
+    """write the chunks of bytes to a new temporary file and rename it to
+    path
+
+    Every writer has its own temporary file, so processes which build the
+    same table at once do not clash: every rename puts a complete file in
+    place and readers never see a partial one.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory or ".", prefix=os.path.basename(path) + ".",
+        suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def build(path, side, goal, groups):
+    """build the tables for all the groups and save them to path"""
+    check_partition(side, groups)
+    tables = [build_table(side, goal, tiles) for tiles in groups]
+    save(path, side, goal, groups, tables)
+
+
+def check_partition(side, groups):
+    tiles = sorted(t for group in groups for t in group)
+    if tiles != list(range(1, side * side)):
+        raise ValueError("Groups must split all the tiles 1..{} without "
+                         "repetitions".format(side * side - 1))
+
+
+def default_partition(side):
+    """the full table for 3x3 and groups of 5 consecutive tiles otherwise"""
+    tiles = side * side - 1
+    if side == 3:
+        sizes = [tiles]
+    else:
+        sizes = [5] * (tiles // 5)
+        if tiles % 5:
+            sizes.append(tiles % 5)
+    return partition(side, sizes)
+
+
+def partition(side, sizes):
+    """split the tiles into groups of consecutive tiles of given sizes"""
+    groups = []
+    first = 1
+    for k in sizes:
+        groups.append(list(range(first, first + k)))
+        first += k
+    check_partition(side, groups)
+    return groups
+
+
+def zero_name(goal):
+    """part of the table file names: zl or z0 for the zero element at the
+    end or at the beginning of the goal, z<index> otherwise"""
+    zero = list(goal).index(0)
+    if zero == len(goal) - 1:
+        return "zl"
+    return "z{}".format(zero)
+
+
+def default_path(side, goal, groups):
+    name = "pdb_{0}x{0}_{1}_{2}_{3:08x}.bin".format(
+        side, zero_name(goal),
+        "-".join(str(len(tiles)) for tiles in groups),
+        zlib.crc32(bytes(goal) + b"/".join(bytes(t) for t in groups)))
+    return os.path.join(TABLES_DIR, name)
+
+
+def load(side, goal, groups=None, path=None):
+    """pattern database for the board, built and saved if it does not exist
+
+    Loaded databases are cached, so every solver in the process uses
+    the same mapping. Thread-safe, threads of a process build or load a
+    database once; processes which do not find the file at the same time
+    all build it, see write_atomic().
+
+    Returns
+    -------
+    PatternDatabase
+    """
+    if groups is None:
+        groups = default_partition(side)
+    if path is None:
+        path = default_path(side, goal, groups)
+    with _loaded_lock:
+        if path not in _loaded:
+            if not os.path.exists(path):
+                build(path, side, goal, groups)
+            _loaded[path] = PatternDatabase(path)
+        database = _loaded[path]
+    # checked on every call, the cached file may be asked for another goal
+    if database.side != side or database.goal != list(goal):
+        raise ValueError("{} is built for another goal".format(path))
+    return database
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="pattern database tables")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="build the tables")
+    build_parser.add_argument("side", type=int, help="side of the board")
+    build_parser.add_argument("-p", "--partition", default=None,
+                              help="sizes of the groups of consecutive tiles,\
+                              e.g. 6,6,3, default full table for 3x3 and\
+                              groups of 5 tiles otherwise")
+    build_parser.add_argument("-zl", "--zerolast", action='store_true',
+                              help="zero is the last element of the goal")
+    build_parser.add_argument("-o", "--output", default=None,
+                              help="file name, default in the tables\
+                              directory")
+    compare_parser = commands.add_parser(
+        "compare", help="compare expanded nodes with the Manhattan distance")
+    compare_parser.add_argument("initial", nargs="+",
+                                help="initial states in format: 0,1,2,3 etc")
+    compare_parser.add_argument("-m", "--method", default="ast",
+                                help="ast or idastar, default ast")
+    compare_parser.add_argument("-n", "--nodes", default='2000000',
+                                help="maximum number of nodes to visit")
+    compare_parser.add_argument("-zl", "--zerolast", action='store_true',
+                                help="zero is the last element of the goal")
+    compare_parser.add_argument("-t", "--table", default=None,
+                                help="pattern database file")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        size = args.side * args.side
+        if args.zerolast:
+            goal = list(range(1, size)) + [0]
+        else:
+            goal = list(range(size))
+        if args.partition:
+            groups = partition(args.side,
+                               list(map(int, args.partition.split(","))))
+        else:
+            groups = default_partition(args.side)
+        path = args.output or default_path(args.side, goal, groups)
+        build(path, args.side, goal, groups)
+        print("saved to", path)
+    else:
+        import heuristics
+
+        boards = [list(map(int, s.split(","))) for s in args.initial]
+        heuristics.print_comparison(heuristics.compare(
+            boards, args.zerolast, args.method, ["manhattan", "pdb"],
+            int(args.nodes), args.table))
@@ -1,14 +1,20 @@
 #!/usr/bin/env python3
 import argparse
-import math
-from search import Solver
+import json
+import sys
+from cache import SolutionCache
+from heuristics import HEURISTICS
+from instrument import Instrument, profile
+from search import Solver, parse_state
 
 
 if __name__ == '__main__':
 
     parser = argparse.ArgumentParser()
     parser.add_argument("method", default="bfs",
-                        help="method of search: bfs, dfs or ast")
+                        help="method of search: bfs, dfs, ast, idastar,\
+                        bibfs, table (3x3 only), npbfs, hdastar, dls,\
+                        iddfs, ebfs or fast (large boards, not optimal)")
     parser.add_argument("initial", default="0,1,2,3,4,5,6,7,8",
                         help="initial state of puzzle in format: 0,1,2,3 etc,\
                         default 0,1,2,3,4,5,6,7,8")
@@ -19,18 +25,88 @@ if __name__ == '__main__':
                              default 200 000")
     parser.add_argument("-zl", "--zerolast", action='store_true',
                         help="WRITE ME")
+    parser.add_argument("-g", "--goal", default=None,
+                        help="goal state in format: 0,1,2,3 etc, by default\
+                        0,1,2,... (1,2,...,0 with -zl)")
+    parser.add_argument("-H", "--heuristic", default="manhattan",
+                        choices=list(HEURISTICS),
+                        help="distance estimate for ast and idastar,\
+                        default manhattan")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="number of processes for hdastar,\
+                        default number of CPUs")
+    parser.add_argument("--weight", type=float, default=1.0,
+                        help="initial weight of the distance for the\
+                        anytime ast, lowered after every solution,\
+                        default 1")
+    parser.add_argument("--deadline-ms", type=float, default=None,
+                        help="time limit of the anytime ast in\
+                        milliseconds, the best solution found is printed")
+    parser.add_argument("--pause-gc", action='store_true',
+                        help="disable the garbage collector during the\
+                        anytime ast, so it does not delay the deadline")
+    parser.add_argument("--max-depth", type=int, default=None,
+                        help="depth limit of dls (required) and iddfs")
+    parser.add_argument("--table-size", type=int, default=0,
+                        help="size of the transposition table of dls and\
+                        iddfs, default 0 (no table)")
+    parser.add_argument("--memory-mb", type=float, default=256,
+                        help="buffer size of ebfs in megabytes, default 256")
+    parser.add_argument("--scratch-dir", default=None,
+                        help="directory of the layer files of ebfs,\
+                        default the system temporary directory")
+    parser.add_argument("--no-shorten", dest="shorten",
+                        action='store_false',
+                        help="keep the cycles in the path of fast")
+    parser.add_argument("--cache", default=None,
+                        help="sqlite file of the solution cache")
+    parser.add_argument("--json", action='store_true',
+                        help="print the statistics as JSON")
+    parser.add_argument("--instrument", action='store_true',
+                        help="add phase timers and counters to the\
+                        statistics")
+    parser.add_argument("--progress", type=int, default=None,
+                        help="print the progress to stderr every PROGRESS\
+                        expanded nodes")
+    parser.add_argument("--profile", choices=["cprofile", "tracemalloc"],
+                        default=None,
+                        help="run the search under cProfile or tracemalloc\
+                        and print the report to stderr")
     args = parser.parse_args()
 
-    init_state = list(map(int, args.initial.split(",")))
-    if (list(range(len(init_state))) != sorted(init_state)):
-        raise ValueError("Wrong initial state! Check if all numbers are here")
-    if (math.sqrt(len(init_state)) != round(math.sqrt(len(init_state)))):
-        raise ValueError("Wrong initial state! Check the array size")
-    solver = Solver(args.method, init_state, zl=args.zerolast)
-    final_state = solver.solve(maxnodes=int(args.nodes))
-    solver.print_stats(args.final)
-    if not final_state:
-        print("Solution is not found")
+    instrument = None
+    if args.instrument or args.progress:
+        instrument = Instrument(
+            progress=(lambda snapshot: print(json.dumps(snapshot),
+                                             file=sys.stderr))
+            if args.progress else None,
+            every=args.progress or 10000)
+    init_state = parse_state(args.initial)
+    solver = Solver(args.method, init_state, zl=args.zerolast,
+                    goal=parse_state(args.goal) if args.goal else None,
+                    heuristic=args.heuristic, workers=args.workers,
+                    instrument=instrument, weight=args.weight,
+                    deadline_ms=args.deadline_ms,
+                    cache=SolutionCache(path=args.cache) if args.cache
+                    else None, max_depth=args.max_depth,
+                    table_size=args.table_size, memory_mb=args.memory_mb,
+                    scratch_dir=args.scratch_dir, shorten=args.shorten,
+                    pause_gc=args.pause_gc)
+    profile_stats = {}
+    if args.profile:
+        final_state, text, profile_stats = profile(
+            lambda: solver.solve(maxnodes=int(args.nodes)), args.profile)
+        print(text, file=sys.stderr)
+    else:
+        final_state = solver.solve(maxnodes=int(args.nodes))
+    if args.json:
+        report = solver.report()
+        report.update(profile_stats)
+        print(json.dumps(report))
+    else:
+        solver.print_stats(args.final)
+        if not final_state:
+            print("Solution is not found")
 
 # 15,14,1,6,9,11,4,12,0,10,7,3,13,8,5,2   PROBLEM
 # 1,2,3,4,13,9,14,5,12,10,15,0,11,8,7,6 -n 100000 -g 1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,0
@@ -1,21 +1,56 @@
+import gc
 import math
 import heapq
+import threading
 import time
 
-from dataclasses import dataclass, field
-from typing import List
+from array import array
+from contextlib import contextmanager, nullcontext
+
+from dataclasses import dataclass, field, replace
+from typing import List, Tuple
 
 import resource
 from resource import RUSAGE_SELF
 
+import distance_table
+import heuristics
+
+OPPOSITE = {"U": "D", "D": "U", "L": "R", "R": "L"}
+# decrease of the weight of the anytime search after every solution
+WEIGHT_STEP = 0.5
+DIRECTIONS = "UDLR"
+# board side -> legal moves of every position of the zero element
+_move_tables = {}
+# goal configuration -> Context
+_contexts = {}
+_contexts_lock = threading.Lock()
+# searches running with the garbage collector paused and whether it was
+# enabled before the first of them
+_gc_pauses = 0
+_gc_enabled = False
+_gc_lock = threading.Lock()
+# methods which find a shortest path
+OPTIMAL_METHODS = ("bfs", "ast", "idastar", "bibfs", "table", "npbfs",
+                   "hdastar", "iddfs", "ebfs")
+
 
 class PuzzleState():
     """ complete information about particular tiles configuration
 
+    The board is packed into a single integer ``key`` with ``bits`` bits
+    per tile (4 bits for boards up to 4x4), position 0 in the most
+    significant bits. Tiles are stored by the rank of their decimal
+    representation, so comparing keys orders states exactly like comparing
+    the comma-separated strings (A* breaks ties by the key). Nodes use
+    ``__slots__`` and are hashed by this key only. The board geometry and
+    the goal are in the shared ``context``, which a child takes from its
+    parent.
+
     Arguments
     ----------
     tiles_config : list[int]
-        initial position of tiles
+        initial position of tiles, may be None if ``key`` is given
     parent : PuzzleState, optional
         PuzzleState which led to the current, by default None
     direction : str, optional
@@ -26,52 +61,72 @@ class PuzzleState():
     ast : bool, optional
         True if A* method is used
         (additional attributes should be initialized), by default False
+    score : int, optional
+        A* score of the state, computed if not given
+    key : int, optional
+        packed tiles configuration, computed from ``tiles_config``
+        if not given
+    hdata : object, optional
+        data of the heuristic for incremental updates (A* only)
+    context : Context, optional
+        board geometry and goal, required if there is no parent
 
     Attributes
     ----------
-        state : list[int]
-            tiles configuration
-        string_state : str
-            tiles configuration as string
+        key : int
+            tiles configuration packed into an integer
         parent: PuzzleState, optional
             PuzzleState which led to the current, by default None
         direction : str, optional
             direction of the move which led from the parent to current state
-        ast : bool, optional
-            True if A* method is used
-            (additional attributes should be initialized), by default False
         depth : int
             depth of the current element in the search tree
         zero_index : int
             index of the zero element
+        score : int or None
+            depth plus heuristic distance to the goal (A* only)
+        hdata : object
+            data of the heuristic for incremental updates (A* only)
+        context : Context
+            board geometry and goal
 
     """
-    def __init__(self, tiles_config, parent=None, direction='',
-                 zero_index=None, ast=False,
-                 coords2d=None, score=None):
-        self.state = tiles_config
-        self.string_state = ",".join(map(str, self.state))
+    __slots__ = ("key", "parent", "direction", "depth", "zero_index",
+                 "score", "hdata", "context")
+
+    def __init__(self, tiles_config=None, parent=None, direction='',
+                 zero_index=None, ast=False, score=None, key=None,
+                 hdata=None, context=None):
+        if parent is not None:
+            context = parent.context
+        self.context = context
+        if key is None:
+            key = pack(tiles_config, context)
+        self.key = key
         self.parent = parent
         self.direction = direction
-        self.ast = ast
         if parent:
             self.depth = parent.depth + 1
         else:
             self.depth = 0
-        if zero_index:
+        if zero_index is not None:
             self.zero_index = zero_index
         else:
             self.zero_index = self.state.index(0)
-        if ast:
-            if coords2d:
-                self.coords2d = coords2d
-            else:
-                self.coords2d = coords_2d(self.state)
-            if score:
-                self.score = score
-            else:
-                self.score = self.manhatten_distance_to_goal()\
-                    + self.depth
+        self.score = score
+        self.hdata = hdata
+        if ast and score is None:
+            self.score = self.manhatten_distance_to_goal() + self.depth
+
+    @property
+    def state(self):
+        """list[int]: tiles configuration unpacked from the key"""
+        return unpack(self.key, self.context)
+
+    @property
+    def string_state(self):
+        """str: tiles configuration as a comma-separated string"""
+        return ",".join(map(str, self.state))
 
     def __repr__(self):
         """ for pretty printing
@@ -81,9 +136,10 @@ class PuzzleState():
         str
             configuration with line breaks to print a tiles in 2d format
         """
-        global side
+        side = self.context.side
+        state = self.state
         return "\n".join(
-            [" ".join(map(str, self.state[i*side:(i+1)*side]))
+            [" ".join(map(str, state[i*side:(i+1)*side]))
              for i in range(side)]
                         ) + "\n"
 
@@ -91,12 +147,20 @@ class PuzzleState():
         """comparison between two PuzzleState instances"""
         return self.score < other.score
 
+    def __eq__(self, other):
+        return isinstance(other, PuzzleState) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
     def manhatten_distance_to_goal(self):
-        dist = 0.0
-        global coords_goal
-        for key in range(1, len(self.state)):
-            dist += abs(coords_goal[key][0] - self.coords2d[key][0]) +\
-                abs(coords_goal[key][1] - self.coords2d[key][1])
+        dist = 0
+        side = self.context.side
+        coords_goal = self.context.coords_goal
+        for i, tile in enumerate(self.state):
+            if tile:
+                dist += abs(coords_goal[tile][0] - i // side) +\
+                    abs(coords_goal[tile][1] - i % side)
         return dist
 
     def neighbours(self):
@@ -107,27 +171,36 @@ class PuzzleState():
         str
             direction where it is possible to move zero element
         """
-        global side
+        side = self.context.side
         if self.zero_index >= side and self.direction != "D":
             yield "U"
-        if self.zero_index < len(self.state) - side and self.direction != "U":
+        if self.zero_index < side * side - side and self.direction != "U":
             yield "D"
         if self.zero_index % side != 0 and self.direction != "R":
             yield "L"
         if self.zero_index % side != side - 1 and self.direction != "L":
             yield "R"
 
-    def neighbours_rev(self):
-        """the same as neightbours(), but in reversed order"""
-        global side
-        if self.zero_index % side != side - 1 and self.direction != "L":
-            yield "R"
-        if self.zero_index % side != 0 and self.direction != "R":
-            yield "L"
-        if self.zero_index < len(self.state) - side and self.direction != "U":
-            yield "D"
-        if self.zero_index >= side and self.direction != "D":
-            yield "U"
+    def _swap(self, direction):
+        """move a zero element in the packed key
+
+        Returns
+        -------
+        tuple(int, int, int)
+            new key, new zero index and the tile which was moved
+        """
+        context = self.context
+        side = context.side
+        if direction == "U":
+            new_zero = self.zero_index - side
+        elif direction == "D":
+            new_zero = self.zero_index + side
+        elif direction == "L":
+            new_zero = self.zero_index - 1
+        else:
+            new_zero = self.zero_index + 1
+        key, code = swap(self.key, self.zero_index, new_zero, context)
+        return key, new_zero, context.code_tiles[code]
 
     def make_move(self, direction):
         """change a configuration with moving a zero element in the desired direction
@@ -141,94 +214,158 @@ class PuzzleState():
         PuzzleState
             an instance of PuzzleState obtained after moving performed
         """
-        new_state = list(self.state)
-        global side
-        if direction == "U":
-            new_state[self.zero_index], new_state[self.zero_index-side] =\
-                new_state[self.zero_index-side], new_state[self.zero_index]
-            zero_index_delta = -side
-        elif direction == "D":
-            new_state[self.zero_index], new_state[self.zero_index+side] =\
-                new_state[self.zero_index+side], new_state[self.zero_index]
-            zero_index_delta = side
-        elif direction == "L":
-            new_state[self.zero_index], new_state[self.zero_index-1] =\
-                new_state[self.zero_index-1], new_state[self.zero_index]
-            zero_index_delta = -1
-        elif direction == "R":
-            new_state[self.zero_index], new_state[self.zero_index+1] =\
-                new_state[self.zero_index+1], new_state[self.zero_index]
-            zero_index_delta = 1
-        return PuzzleState(new_state, parent=self, direction=direction,
-                           zero_index=self.zero_index + zero_index_delta)
-
-    def make_move_ast(self, direction):
+        key, new_zero, _ = self._swap(direction)
+        return PuzzleState(parent=self, direction=direction,
+                           zero_index=new_zero, key=key)
+
+    def make_move_ast(self, direction, heuristic):
         """change a configuration with moving a zero element in the desired direction
 
+        The score is updated incrementally by the heuristic.
+
         Parameters
         ----------
         direction : str, {"U", "D", "L", "R"}
+        heuristic : heuristics.Heuristic
+            heuristic which evaluated the current state
 
         Returns
         -------
         PuzzleState
             an instance of PuzzleState obtained after moving performed
         """
-        new_state = list(self.state)
-        coords2d = self.coords2d.copy()
-        global side, coords_goal
-        if direction == "U":
-            new_state[self.zero_index], new_state[self.zero_index-side] =\
-                new_state[self.zero_index-side], new_state[self.zero_index]
-            coords2d[0] = (coords2d[0][0] - 1, coords2d[0][1])
-            coords2d[new_state[self.zero_index]] =\
-                (coords2d[new_state[self.zero_index]][0] + 1,
-                 coords2d[new_state[self.zero_index]][1])
-            manh_diff = abs(coords_goal[new_state[self.zero_index]][0] -
-                            coords2d[new_state[self.zero_index]][0])\
-                - abs(coords_goal[new_state[self.zero_index]][0] -
-                      self.coords2d[new_state[self.zero_index]][0])
-            zero_index_delta = -side
-        elif direction == "D":
-            new_state[self.zero_index], new_state[self.zero_index+side] =\
-                new_state[self.zero_index+side], new_state[self.zero_index]
-            coords2d[0] = (coords2d[0][0] + 1, coords2d[0][1])
-            coords2d[new_state[self.zero_index]] =\
-                (coords2d[new_state[self.zero_index]][0] - 1,
-                 coords2d[new_state[self.zero_index]][1])
-            manh_diff = abs(coords_goal[new_state[self.zero_index]][0] -
-                            coords2d[new_state[self.zero_index]][0])\
-                - abs(coords_goal[new_state[self.zero_index]][0] -
-                      self.coords2d[new_state[self.zero_index]][0])
-            zero_index_delta = side
-        elif direction == "L":
-            new_state[self.zero_index], new_state[self.zero_index-1] =\
-                new_state[self.zero_index-1], new_state[self.zero_index]
-            coords2d[0] = (coords2d[0][0], coords2d[0][1] - 1)
-            coords2d[new_state[self.zero_index]] =\
-                (coords2d[new_state[self.zero_index]][0],
-                 coords2d[new_state[self.zero_index]][1] + 1)
-            manh_diff = abs(coords_goal[new_state[self.zero_index]][1] -
-                            coords2d[new_state[self.zero_index]][1])\
-                - abs(coords_goal[new_state[self.zero_index]][1] -
-                      self.coords2d[new_state[self.zero_index]][1])
-            zero_index_delta = -1
-        elif direction == "R":
-            new_state[self.zero_index], new_state[self.zero_index+1] =\
-                new_state[self.zero_index+1], new_state[self.zero_index]
-            coords2d[0] = (coords2d[0][0], coords2d[0][1] + 1)
-            coords2d[new_state[self.zero_index]] =\
-                (coords2d[new_state[self.zero_index]][0],
-                 coords2d[new_state[self.zero_index]][1] - 1)
-            manh_diff = abs(coords_goal[new_state[self.zero_index]][1] -
-                            coords2d[new_state[self.zero_index]][1])\
-                - abs(coords_goal[new_state[self.zero_index]][1] -
-                      self.coords2d[new_state[self.zero_index]][1])
-            zero_index_delta = 1
-        return PuzzleState(new_state, parent=self, direction=direction,
-                           zero_index=self.zero_index + zero_index_delta,
-                           ast=self.ast,
-                           coords2d=coords2d, score=self.score+manh_diff+1)
+        key, new_zero, tile = self._swap(direction)
+        dist, hdata = heuristic.update(
+            self.score - self.depth, self.hdata,
+            PackedBoard(key, self.context), tile,
+            new_zero, self.zero_index)
+        return PuzzleState(parent=self, direction=direction,
+                           zero_index=new_zero, key=key,
+                           score=self.depth + 1 + dist, hdata=hdata)
+
+
+class PackedBoard():
+    """read-only list-like view of a packed tiles configuration"""
+    __slots__ = ("key", "context")
+
+    def __init__(self, key, context):
+        self.key = key
+        self.context = context
+
+    def __getitem__(self, i):
+        context = self.context
+        return context.code_tiles[(self.key >> context.shifts[i]) &
+                                  context.mask]
+
+
+class NodeStore():
+    """search nodes in arrays instead of PuzzleState objects
+
+    Node 0 is the initial state. A node is its packed configuration, the
+    index of the zero element, the index of its parent and the direction
+    of the move from the parent (index in DIRECTIONS), four directions
+    in a byte. The configurations are in an unsigned 64-bit array when
+    they fit, otherwise in a list.
+
+    Arguments
+    ----------
+    key : int
+        packed initial configuration
+    zero : int
+        index of the zero element of the initial configuration
+    context : Context
+        board geometry and goal
+
+    Attributes
+    ----------
+        keys : array.array or list[int]
+            packed configurations
+        zeros : array.array
+            indices of the zero element
+        parents : array.array
+            indices of the parents, 0 for the initial state
+        directions : bytearray
+            directions of the moves from the parents, 2 bits per node
+    """
+    __slots__ = ("keys", "zeros", "parents", "directions")
+
+    def __init__(self, key, zero, context):
+        bits = len(context.shifts) * context.mask.bit_length()
+        self.keys = array("Q") if bits <= 64 else []
+        self.zeros = array("H")
+        self.parents = array("I")
+        self.directions = bytearray()
+        self.add(key, zero, 0, 0)
+
+    def __len__(self):
+        return len(self.parents)
+
+    def add(self, key, zero, parent, direction):
+        """append a node
+
+        Returns
+        -------
+        int
+            index of the node
+        """
+        index = len(self.parents)
+        if not index & 3:
+            self.directions.append(direction)
+        else:
+            self.directions[index >> 2] |= direction << 2 * (index & 3)
+        self.keys.append(key)
+        self.zeros.append(zero)
+        self.parents.append(parent)
+        return index
+
+    def direction(self, index):
+        """direction of the move from the parent, index in DIRECTIONS"""
+        return self.directions[index >> 2] >> 2 * (index & 3) & 3
+
+    def moves(self, index):
+        """moves from the initial state to the node
+
+        Returns
+        -------
+        list[str]
+        """
+        moves = []
+        while index:
+            moves.append(DIRECTIONS[self.direction(index)])
+            index = self.parents[index]
+        return moves[::-1]
+
+
+class Path():
+    """lazy path of a solution
+
+    Iterating replays the moves from the initial state, every state is
+    made when it is reached and is not linked to the ones before.
+
+    Arguments
+    ----------
+    initial_state : PuzzleState
+    moves : list[str]
+        directions of the zero element moves
+    """
+    __slots__ = ("initial_state", "moves")
+
+    def __init__(self, initial_state=None, moves=()):
+        self.initial_state = initial_state
+        self.moves = moves
+
+    def __len__(self):
+        return len(self.moves) + 1 if self.initial_state else 0
+
+    def __iter__(self):
+        state = self.initial_state
+        if state is None:
+            return
+        yield state
+        for direction in self.moves:
+            state = state.make_move(direction)
+            state.parent = None
+            yield state
 
 
 class Solver():
@@ -241,157 +378,920 @@ class Solver():
 
     Args
     ----------
-    method : str, {"bfs", "dfs", "ast"}
+    method : str, {"bfs", "dfs", "ast", "idastar", "bibfs", "table", "npbfs",
+                   "hdastar", "dls", "iddfs", "ebfs", "fast"}
         a method to solve a game
     array : list[int]
         initial position of tiles
     zl : bool
         True if zero is a last element of the goal array,
         default False
+    goal : list[int], optional
+        any goal tiles configuration, replaces zl. The tiles are relabeled
+        so that the search runs towards the canonical goal with the zero
+        element at the same place (see canonical_goal()) and shares its
+        tables with all the goals with this zero position
+    heuristic : str, {"manhattan", "linear_conflict", "walking_distance",
+                      "pdb"}
+        distance estimate for the ast and idastar methods,
+        default "manhattan"
+    pdb_path : str, optional
+        pattern database file for the "pdb" heuristic, by default the
+        default partition from the tables directory (built if it does
+        not exist)
+    workers : int, optional
+        number of processes for the hdastar method, by default the number
+        of CPUs
+    instrument : instrument.Instrument, optional
+        phase timers, counters and progress callback of the search,
+        by default None (no instrumentation)
+    weight : float
+        initial weight of the distance for the anytime ast, default 1
+    deadline_ms : float, optional
+        time limit of the anytime ast in milliseconds from the creation
+        of the solver, by default None (no limit)
+    cache : cache.SolutionCache, optional
+        cache of the solutions of the methods which find a shortest path,
+        by default None
+    max_depth : int, optional
+        depth limit of the dls (required) and iddfs methods
+    table_size : int
+        number of states in the transposition table of the dls and iddfs
+        methods, default 0 (only the current path is checked for cycles)
+    memory_mb : float
+        size of the buffer of the ebfs method in megabytes, default 256
+    scratch_dir : str, optional
+        directory of the layer files of the ebfs method, by default the
+        system temporary directory
+    shorten : bool
+        remove the cycles from the path of the fast method, default True
+    pause_gc : bool
+        disable the garbage collector of the process during the anytime
+        ast, so a deadline is not overrun by a full collection; it
+        affects the other threads, default False
 
     Attributes
     ----------
         _method : str
             method of solving
         goal_array : list
-            goal tiles configuration
-        goal : str
-            goal tiles configuration in a format of string
+            goal tiles configuration of the search (canonical)
+        target : list
+            goal tiles configuration as given
+        labels : list[int] or None
+            tile of the search for every tile of the given boards, None if
+            the goal is canonical; the states of the search (initial_state,
+            final_state, statistics.path) use these labels
+        goal : int
+            goal tiles configuration packed into an integer
+        context : Context
+            board geometry and goal data, shared by the solvers with the
+            same goal
         initial_state : PuzzleState
             initial state
         statistics : Stats
             holds all the neccessary statistics data
         final_state : PuzzleState
             final element
+        heuristic : heuristics.Heuristic
+            distance estimate for the ast and idastar methods, built on
+            the first use
+        workers : int or None
+            number of processes for the hdastar method
+        instrument : instrument.Instrument or None
+            instrumentation of the search
+        weight : float
+            initial weight of the distance for the anytime ast
+        deadline_ms : float or None
+            time limit of the anytime ast in milliseconds, counted from
+            the creation of the solver
+        cache : cache.SolutionCache or None
+            cache of the optimal solutions
+        max_depth : int or None
+            depth limit of the dls and iddfs methods
+        table_size : int
+            size of the transposition table of the dls and iddfs methods
+        memory_mb : float
+            size of the buffer of the ebfs method in megabytes
+        scratch_dir : str or None
+            directory of the layer files of the ebfs method
+        shorten : bool
+            whether the cycles are removed from the path of the fast method
+        pause_gc : bool
+            whether the garbage collector is disabled during the anytime
+            ast
 
     Raises
     ------
     AttributeError
         if the parity of initial state and the goal are not the same, that
         is a system is not solvable
+    ValueError
+        if the weight is smaller than 1, the dls method is used without
+        max_depth or the goal is not a permutation of the tiles
     """
     # TODO make a function to compare all methods
 
-    def __init__(self, method, array, zl=False):
-        global side, coords_goal
-        side = int(math.sqrt(len(array)))
+    def __init__(self, method, array, zl=False, goal=None,
+                 heuristic="manhattan",
+                 pdb_path=None, workers=None, instrument=None, weight=1.0,
+                 deadline_ms=None, cache=None, max_depth=None,
+                 table_size=0, memory_mb=256, scratch_dir=None,
+                 shorten=True, pause_gc=False):
+        # the clock of the statistics and the anytime deadline includes
+        # the setup, e.g. loading the heuristic tables
+        start_time = time.time()
         self._method = method
-        if zl:
-            self.goal_array = list(range(1, len(array))) + [0]
-        else:
-            self.goal_array = list(range(len(array)))
-        coords_goal = coords_2d(self.goal_array)
-        self.initial_state = PuzzleState(list(array), ast=(method == "ast"))
-        self.goal = ",".join(map(str, self.goal_array))
-        self.statistics = Stats()
+        if goal is None:
+            goal = list(range(1, len(array))) + [0] if zl\
+                else list(range(len(array)))
+        elif sorted(goal) != list(range(len(array))):
+            raise ValueError("The goal must have the tiles of the initial "
+                             "state")
+        self.target = list(goal)
+        self.goal_array = canonical_goal(len(goal), goal.index(0))
+        self.labels = None
+        if self.target != self.goal_array:
+            self.labels = [0] * len(goal)
+            for tile, label in zip(self.target, self.goal_array):
+                self.labels[tile] = label
+            array = [self.labels[tile] for tile in array]
+        self.context = context(self.goal_array)
+        if heuristic not in heuristics.HEURISTICS:
+            raise ValueError("Unknown heuristic {}, use one of: {}".format(
+                heuristic, ", ".join(heuristics.HEURISTICS)))
+        self._heuristic_options = {"pdb_path": pdb_path}\
+            if heuristic == "pdb" else {}
+        # built on the first use, the other methods do not need it
+        self._heuristic = None
+        self.workers = workers
+        self.instrument = instrument
+        if weight < 1:
+            raise ValueError("The weight must be at least 1")
+        self.weight = weight
+        self.deadline_ms = deadline_ms
+        self.cache = cache
+        if method == "dls" and max_depth is None:
+            raise ValueError("The dls method needs max_depth")
+        self.max_depth = max_depth
+        self.table_size = table_size
+        self.memory_mb = memory_mb
+        self.scratch_dir = scratch_dir
+        self.shorten = shorten
+        self.pause_gc = pause_gc
+        self.statistics = Stats(heuristic=heuristic,
+                                start_time=start_time)
+        self.initial_state = PuzzleState(list(array), context=self.context)
+        if method == "ast":
+            self.initial_state.score, self.initial_state.hdata =\
+                self.heuristic.evaluate(array)
+        self.goal = self.context.goal_key
         self.final_state = None
         if not self.check_solvability():
             raise AttributeError("The initial state is not solvable")
 
+    @property
+    def heuristic(self):
+        """heuristics.Heuristic: distance estimate of the ast and idastar
+        methods, built (or taken from the shared instances) on the first
+        use"""
+        if self._heuristic is None:
+            self._heuristic = heuristics.get(
+                self.statistics.heuristic, self.context.side,
+                self.goal_array, **self._heuristic_options)
+        return self._heuristic
+
+    def optimal(self):
+        """True if the method finds a shortest path"""
+        return self._method in OPTIMAL_METHODS and not (
+            self._method == "ast" and
+            (self.weight != 1 or self.deadline_ms is not None))
+
     def is_goal(self, state):
-        return state.string_state == self.goal
+        return state.key == self.goal
 
     def solve(self, maxnodes=500000):
-        if self._method == "bfs":
+        use_cache = self.cache is not None and self.optimal()
+        moves = None
+        if use_cache:
+            moves = self.cache.get(self.initial_state.state, self.goal_array)
+        if moves is not None:
+            self.statistics.cached = True
+            self.final_state = self.replay(moves)
+        elif self._method == "bfs":
             self.final_state = self.bfs(maxnodes=maxnodes)
         elif self._method == "dfs":
             self.final_state = self.dfs(maxnodes=maxnodes)
         elif self._method == "ast":
             self.final_state = self.ast(maxnodes=maxnodes)
+        elif self._method == "idastar":
+            self.final_state = self.idastar(maxnodes=maxnodes)
+        elif self._method == "bibfs":
+            self.final_state = self.bibfs(maxnodes=maxnodes)
+        elif self._method == "table":
+            self.final_state = self.table(maxnodes=maxnodes)
+        elif self._method == "npbfs":
+            self.final_state = self.npbfs(maxnodes=maxnodes)
+        elif self._method == "hdastar":
+            self.final_state = self.hdastar(maxnodes=maxnodes)
+        elif self._method == "dls":
+            self.final_state = self.dls(maxnodes=maxnodes)
+        elif self._method == "iddfs":
+            self.final_state = self.iddfs(maxnodes=maxnodes)
+        elif self._method == "ebfs":
+            self.final_state = self.ebfs(maxnodes=maxnodes)
+        elif self._method == "fast":
+            self.final_state = self.fast(maxnodes=maxnodes)
         if self.final_state:
             self.get_path()
+            if use_cache and moves is None:
+                self.cache.put(self.initial_state.state, self.goal_array,
+                               self.statistics.moves)
         self.statistics.end_time = time.time()
         self.statistics.total_time = self.statistics.end_time -\
             self.statistics.start_time
         return self.final_state
 
     def bfs(self, maxnodes):
-        queue = [self.initial_state]
-        queue_strs = {self.initial_state.string_state}
-        visited = {''}
-        while queue:
-            current_state = queue.pop(0)
-            queue_strs.remove(current_state.string_state)
+        """breadth-first search
 
-            if self.is_goal(current_state):
-                return current_state
-            self.statistics.nodes += 1
-            if self.statistics.nodes > maxnodes:
+        The nodes are kept in a NodeStore, which is also the queue: they
+        are expanded in the order they were added.
+        """
+        context = self.context
+        moves = context.moves
+        shifts, mask = context.shifts, context.mask
+        stats = self.statistics
+        inst = self.instrument
+        goal = self.goal
+        nodes = NodeStore(self.initial_state.key,
+                          self.initial_state.zero_index, context)
+        keys, zeros, parents = nodes.keys, nodes.zeros, nodes.parents
+        seen = {self.initial_state.key}
+        # the nodes before layer_end have the depth of the current node
+        depth, layer_end = 0, 1
+        head = 0
+        while head < len(nodes):
+            if head == layer_end:
+                depth, layer_end = depth + 1, len(nodes)
+            key = keys[head]
+            if key == goal:
+                return self.replay(nodes.moves(head))
+            stats.nodes += 1
+            if stats.nodes > maxnodes:
                 break
-            visited.add(current_state.string_state)
+            if inst is not None and stats.nodes >= inst.next_tick:
+                inst.tick(stats, len(nodes) - head - 1, head + 1)
 
-            for d in current_state.neighbours():
-                new_s = current_state.make_move(d)
-                if (new_s.string_state not in visited) and\
-                        (new_s.string_state not in queue_strs):
-                    queue.append(new_s)
-                    queue_strs.add(new_s.string_state)
-                    if new_s.depth > self.statistics.max_depth:
-                        self.statistics.max_depth = new_s.depth
+            zero = zeros[head]
+            # the move back leads to the zero position of the parent
+            back = zeros[parents[head]] if head else -1
+            for direction, new_zero, _ in moves[zero]:
+                if new_zero == back:
+                    continue
+                code = (key >> shifts[new_zero]) & mask
+                new_key = key + (code << shifts[zero]) -\
+                    (code << shifts[new_zero])
+                if new_key not in seen:
+                    seen.add(new_key)
+                    nodes.add(new_key, new_zero, head, direction)
+                    if depth + 1 > stats.max_depth:
+                        stats.max_depth = depth + 1
+            head += 1
 
     def dfs(self, maxnodes):
-        queue = [self.initial_state]
-        queue_strs = {self.initial_state.string_state}
-        visited = {''}
-        while queue:
-            current_state = queue.pop()
-            queue_strs.remove(current_state.string_state)
-            if current_state.depth > self.statistics.max_depth:
-                self.statistics.max_depth = current_state.depth
+        """depth-first search
 
-            if self.is_goal(current_state):
-                return current_state
-            self.statistics.nodes += 1
-            if self.statistics.nodes > maxnodes:
+        The nodes are kept in a NodeStore, the stack holds their indices.
+        """
+        context = self.context
+        moves = context.moves
+        shifts, mask = context.shifts, context.mask
+        stats = self.statistics
+        inst = self.instrument
+        goal = self.goal
+        nodes = NodeStore(self.initial_state.key,
+                          self.initial_state.zero_index, context)
+        keys, zeros, parents = nodes.keys, nodes.zeros, nodes.parents
+        depths = array("I", [0])
+        stack = [0]
+        seen = {self.initial_state.key}
+        while stack:
+            index = stack.pop()
+            depth = depths[index]
+            if depth > stats.max_depth:
+                stats.max_depth = depth
+
+            key = keys[index]
+            if key == goal:
+                return self.replay(nodes.moves(index))
+            stats.nodes += 1
+            if stats.nodes > maxnodes:
                 break
-            visited.add(current_state.string_state)
+            if inst is not None and stats.nodes >= inst.next_tick:
+                inst.tick(stats, len(stack), stats.nodes)
 
-            for d in current_state.neighbours_rev():
-                new_s = current_state.make_move(d)
-                if (new_s.string_state not in visited) and\
-                        (new_s.string_state not in queue_strs):
-                    queue.append(new_s)
-                    queue_strs.add(new_s.string_state)
+            zero = zeros[index]
+            back = zeros[parents[index]] if index else -1
+            # the last child pushed is expanded first, so the moves are
+            # pushed in the order "RLDU"
+            for direction, new_zero, _ in reversed(moves[zero]):
+                if new_zero == back:
+                    continue
+                code = (key >> shifts[new_zero]) & mask
+                new_key = key + (code << shifts[zero]) -\
+                    (code << shifts[new_zero])
+                if new_key not in seen:
+                    seen.add(new_key)
+                    stack.append(nodes.add(new_key, new_zero, index,
+                                           direction))
+                    depths.append(depth + 1)
 
     def ast(self, maxnodes):
-        queue = {self.initial_state.string_state: self.initial_state}
+        if self.weight != 1 or self.deadline_ms is not None:
+            with gc_paused() if self.pause_gc else nullcontext():
+                return self.anytime(maxnodes)
+        if self.instrument is not None:
+            return self._ast_instrumented(maxnodes)
+        context = self.context
+        moves = context.moves
+        shifts, mask, code_tiles = context.shifts, context.mask,\
+            context.code_tiles
+        update = self.heuristic.update
+        delta = self.heuristic.delta
+        stats = self.statistics
+        goal = self.goal
+        queue = {self.initial_state.key: self.initial_state}
+        hqueue = []
+        heapq.heappush(hqueue, (self.initial_state.score,
+                                self.initial_state.key))
+        visited = set()
+        while hqueue:
+            _, key = heapq.heappop(hqueue)
+            current_state = queue[key]
+            depth = current_state.depth
+            if depth > stats.max_depth:
+                stats.max_depth = depth
+
+            if key == goal:
+                return current_state
+            stats.nodes += 1
+            if stats.nodes > maxnodes:
+                break
+            visited.add(key)
+
+            zero = current_state.zero_index
+            # the move back leads to the zero position of the parent
+            back = current_state.parent.zero_index\
+                if current_state.parent else -1
+            dist = current_state.score - depth
+            new_depth = depth + 1
+            for direction, new_zero, index in moves[zero]:
+                if new_zero == back:
+                    continue
+                code = (key >> shifts[new_zero]) & mask
+                new_key = key + (code << shifts[zero]) -\
+                    (code << shifts[new_zero])
+                if new_key in visited:
+                    continue
+                old = queue.get(new_key)
+                if old is not None and old.depth <= new_depth:
+                    continue
+                tile = code_tiles[code]
+                if delta is not None:
+                    new_dist, hdata = dist + delta[tile][index], None
+                else:
+                    new_dist, hdata = update(dist, current_state.hdata,
+                                             PackedBoard(new_key, context),
+                                             tile,
+                                             new_zero, zero)
+                new_s = PuzzleState(parent=current_state,
+                                    direction=DIRECTIONS[direction],
+                                    zero_index=new_zero, key=new_key,
+                                    score=new_depth + new_dist, hdata=hdata)
+                heapq.heappush(hqueue, (new_s.score, new_key))
+                queue[new_key] = new_s
+
+    def _ast_instrumented(self, maxnodes):
+        """ast() with the phase timers and counters of self.instrument
+
+        Expands the same nodes in the same order as ast().
+        """
+        inst = self.instrument
+        phases = inst.phases
+        heuristic = inst.timed(self.heuristic)
+        clock = time.perf_counter
+        stats = self.statistics
+        queue = {self.initial_state.key: self.initial_state}
         hqueue = []
         heapq.heappush(hqueue, (self.initial_state.score,
-                                self.initial_state.string_state))
-        visited = {''}
+                                self.initial_state.key))
+        visited = set()
         while hqueue:
-            _, str = heapq.heappop(hqueue)
-            current_state = queue[str]
-            if current_state.depth > self.statistics.max_depth:
-                self.statistics.max_depth = current_state.depth
+            if len(hqueue) > inst.max_open:
+                inst.max_open = len(hqueue)
+            start = clock()
+            _, key = heapq.heappop(hqueue)
+            phases["heap"] += clock() - start
+            current_state = queue[key]
+            if current_state.depth > stats.max_depth:
+                stats.max_depth = current_state.depth
 
             if self.is_goal(current_state):
                 return current_state
-            self.statistics.nodes += 1
-            if self.statistics.nodes > maxnodes:
+            stats.nodes += 1
+            if stats.nodes > maxnodes:
                 break
-            visited.add(current_state.string_state)
+            visited.add(current_state.key)
+            inst.max_closed = len(visited)
+            if stats.nodes >= inst.next_tick:
+                inst.tick(stats, len(hqueue), len(visited))
 
             for d in current_state.neighbours():
-                new_s = current_state.make_move_ast(d)
-                if new_s.string_state not in visited:
-                    if new_s.string_state not in queue\
-                     or queue[new_s.string_state].depth > new_s.depth:
-                        heapq.heappush(hqueue,
-                                       (new_s.score, new_s.string_state))
-                        queue[new_s.string_state] = new_s
+                start = clock()
+                heuristic_time = phases["heuristic"]
+                new_s = current_state.make_move_ast(d, heuristic)
+                phases["expand"] += clock() - start -\
+                    (phases["heuristic"] - heuristic_time)
+                start = clock()
+                if new_s.key not in visited:
+                    old = queue.get(new_s.key)
+                    if old is None or old.depth > new_s.depth:
+                        if old is not None:
+                            inst.reopened += 1
+                        queue[new_s.key] = new_s
+                        phases["dedup"] += clock() - start
+                        start = clock()
+                        heapq.heappush(hqueue, (new_s.score, new_s.key))
+                        phases["heap"] += clock() - start
+                        continue
+                inst.duplicates += 1
+                phases["dedup"] += clock() - start
+
+    def anytime(self, maxnodes):
+        """anytime weighted A*
+
+        Nodes are expanded in the order of depth + weight * distance, so
+        the first solution is found fast. Every new solution lowers the
+        weight by WEIGHT_STEP (not below 1) and the search goes on with the
+        same open list, pruning the nodes with depth + distance not
+        smaller than the cost of the best solution. A node is expanded
+        again when a shorter path to it is found. The search stops when
+        the open list is empty (the solution is optimal), at the deadline
+        or after maxnodes expansions, and returns the best solution.
+
+        The smallest depth + distance in the open list is a lower bound of
+        the optimal cost: the first node of an optimal path which is not
+        expanded with its optimal depth is there. A second heap ordered by
+        depth + distance finds it without a scan of the open list at the
+        deadline. The bound is saved with the ratio of the cost to it in
+        the statistics.
+        """
+        stats = self.statistics
+        deadline = math.inf if self.deadline_ms is None else\
+            stats.start_time + self.deadline_ms / 1000
+        inst = self.instrument
+        weight = self.weight
+        start = self.initial_state
+        # packed configuration -> state with the shortest known path
+        best = {start.key: start}
+        # configurations expanded with the depth of their state in best
+        closed = set()
+        hqueue = [(start.score * weight, 0, start.key)]
+        fqueue = [(start.score, 0, start.key)]
+        incumbent = start if self.is_goal(start) else None
+        cost = 0 if incumbent else math.inf
+
+        def live(entry):
+            """the state of a queue entry if it is not outdated, pruned or
+            expanded"""
+            state = best[entry[2]]
+            if state.depth == -entry[1] and state.score < cost and\
+                    entry[2] not in closed:
+                return state
+
+        def reweight():
+            """the live entries of the open list ordered with the new
+            weight, None if the deadline passed meanwhile"""
+            queue = []
+            for i, entry in enumerate(hqueue):
+                if i % 4096 == 0 and time.time() >= deadline:
+                    return None
+                s = live(entry)
+                if s:
+                    queue.append((s.depth + weight * (s.score - s.depth),
+                                  -s.depth, s.key))
+            heapq.heapify(queue)
+            return queue
+
+        while hqueue:
+            if stats.nodes >= maxnodes or\
+                    stats.nodes % 16 == 0 and time.time() >= deadline:
+                break
+            entry = heapq.heappop(hqueue)
+            state = live(entry)
+            if state is None:
+                continue
+            closed.add(state.key)
+            # keep the top of fqueue live, so the bound is ready at any time
+            while fqueue and not live(fqueue[0]):
+                heapq.heappop(fqueue)
+            if state.depth > stats.max_depth:
+                stats.max_depth = state.depth
+            stats.nodes += 1
+            if inst is not None and stats.nodes >= inst.next_tick:
+                inst.tick(stats, len(hqueue), len(closed))
+
+            for d in state.neighbours():
+                new_s = state.make_move_ast(d, self.heuristic)
+                if new_s.score >= cost:
+                    continue
+                old = best.get(new_s.key)
+                if old is not None and old.depth <= new_s.depth:
+                    continue
+                best[new_s.key] = new_s
+                closed.discard(new_s.key)
+                if self.is_goal(new_s):
+                    incumbent, cost = new_s, new_s.depth
+                    stats.solutions.append(
+                        (round(time.time() - stats.start_time, 6), cost,
+                         weight))
+                    weight = max(1.0, weight - WEIGHT_STEP)
+                    hqueue = reweight()
+                    if hqueue is None:
+                        # the search stops with the best solution
+                        break
+                    continue
+                heapq.heappush(hqueue, (new_s.depth + weight *
+                                        (new_s.score - new_s.depth),
+                                        -new_s.depth, new_s.key))
+                heapq.heappush(fqueue, (new_s.score, -new_s.depth, new_s.key))
+
+        while fqueue and not live(fqueue[0]):
+            heapq.heappop(fqueue)
+        stats.lower_bound = min(cost, fqueue[0][0]) if fqueue else cost
+        if incumbent:
+            stats.suboptimality = cost / stats.lower_bound\
+                if stats.lower_bound else 1.0
+        return incumbent
+
+    def idastar(self, maxnodes):
+        """iterative-deepening A*
+
+        The search makes and unmakes moves in place on a single list, so
+        only the current path is kept in memory. The threshold on
+        f = depth + distance is raised to the smallest f which exceeded
+        it in the previous iteration.
+        """
+        side = self.context.side
+        board = self.initial_state.state
+        last = len(board) - side
+        # direction, zero index shift, opposite direction
+        steps = (("U", -side, "D"), ("D", side, "U"),
+                 ("L", -1, "R"), ("R", 1, "L"))
+        path = []
+        stats = self.statistics
+        update = self.heuristic.update
+        inst = self.instrument
+
+        def search(zero, depth, dist, hdata, bound, previous):
+            """depth-first search below the bound
+
+            Returns
+            -------
+            int or None
+                None if the goal was found, otherwise the smallest
+                f value beyond the bound
+            """
+            f = depth + dist
+            if f > bound:
+                return f
+            if depth > stats.max_depth:
+                stats.max_depth = depth
+            if dist == 0:
+                return None
+            stats.nodes += 1
+            if stats.nodes > maxnodes:
+                return math.inf
+            if inst is not None and stats.nodes >= inst.next_tick:
+                inst.tick(stats, len(path))
+            minimum = math.inf
+            for direction, shift, opposite in steps:
+                if previous == opposite:
+                    continue
+                if (direction == "U" and zero < side) or\
+                        (direction == "D" and zero >= last) or\
+                        (direction == "L" and zero % side == 0) or\
+                        (direction == "R" and zero % side == side - 1):
+                    continue
+                new_zero = zero + shift
+                tile = board[new_zero]
+                board[zero], board[new_zero] = tile, 0
+                new_dist, new_hdata = update(dist, hdata, board, tile,
+                                             new_zero, zero)
+                path.append(direction)
+                t = search(new_zero, depth + 1, new_dist, new_hdata, bound,
+                           direction)
+                if t is None:
+                    return None
+                path.pop()
+                board[zero], board[new_zero] = 0, tile
+                if t < minimum:
+                    minimum = t
+            return minimum
+
+        dist, hdata = self.heuristic.evaluate(board)
+        bound = dist
+        while True:
+            t = search(self.initial_state.zero_index, 0, dist, hdata, bound,
+                       '')
+            if t is None:
+                return self.replay(path)
+            if t == math.inf or stats.nodes > maxnodes:
+                return None
+            bound = t
+
+    def bibfs(self, maxnodes):
+        """bidirectional breadth-first search
+
+        Frontiers grow layer by layer from the initial state and from the
+        goal, always expanding the smaller one. The first state generated
+        by both searches lies on an optimal path: otherwise the searches
+        would have met one layer earlier.
+        """
+        if self.is_goal(self.initial_state):
+            return self.initial_state
+        # packed configuration -> (parent configuration, direction)
+        forward = {self.initial_state.key: None}
+        backward = {self.goal: None}
+        frontiers = [[(self.initial_state.key, self.initial_state.zero_index)],
+                     [(self.goal, self.goal_array.index(0))]]
+        depths = [0, 0]
+        inst = self.instrument
+        while frontiers[0] and frontiers[1]:
+            i = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            seen, other = (forward, backward) if i == 0\
+                else (backward, forward)
+            depths[i] += 1
+            self.statistics.max_depth = max(self.statistics.max_depth,
+                                            depths[i])
+            layer = []
+            for key, zero in frontiers[i]:
+                self.statistics.nodes += 1
+                if self.statistics.nodes > maxnodes:
+                    return None
+                if inst is not None and\
+                        self.statistics.nodes >= inst.next_tick:
+                    inst.tick(self.statistics,
+                              len(frontiers[0]) + len(frontiers[1]) +
+                              len(layer), len(forward) + len(backward))
+                for direction, new_key, new_zero in neighbours(
+                        key, zero, self.context):
+                    if new_key in seen:
+                        continue
+                    seen[new_key] = (key, direction)
+                    if new_key in other:
+                        return self.replay(
+                            join_paths(new_key, forward, backward))
+                    layer.append((new_key, new_zero))
+            frontiers[i] = layer
+
+    def table(self, maxnodes):
+        """optimal path from the perfect distance table of the 3x3 puzzle
+
+        The table is built and saved on the first use. The path is found
+        by a greedy descent, so the number of expanded nodes is the path
+        length and maxnodes is not used.
+        """
+        side = self.context.side
+        if side != 3:
+            raise ValueError("The table method works only for 3x3 boards")
+        moves = distance_table.load(side, self.goal_array).moves(
+            self.initial_state.state)
+        if moves is None:
+            return None
+        self.statistics.nodes = len(moves)
+        self.statistics.max_depth = len(moves)
+        return self.replay(moves)
+
+    def npbfs(self, maxnodes):
+        """breadth-first search over whole layers with NumPy
+
+        Gives the same moves, expanded nodes and maximum depth as bfs().
+        NumPy is imported only when this method is used.
+        """
+        import numpy_bfs
+
+        context = self.context
+        moves, self.statistics.nodes, self.statistics.max_depth =\
+            numpy_bfs.bfs(self.initial_state.key,
+                          self.initial_state.zero_index, self.goal,
+                          context.side, context.shifts, context.mask,
+                          maxnodes)
+        if moves is None:
+            return None
+        return self.replay(moves)
+
+    def hdastar(self, maxnodes):
+        """hash-distributed parallel A* in worker processes
+
+        Gives an optimal path with the same heuristic as ast, see
+        hdastar.py.
+        """
+        import hdastar
+
+        moves, self.statistics.nodes, self.statistics.max_depth =\
+            hdastar.search(self.initial_state.state, goal=self.goal_array,
+                           heuristic=self.statistics.heuristic,
+                           workers=self.workers, maxnodes=maxnodes,
+                           **self._heuristic_options)
+        if moves is None:
+            return None
+        return self.replay(moves)
+
+    def ebfs(self, maxnodes):
+        """breadth-first search with the layers on disk
+
+        Memory is bounded by memory_mb for any number of states, see
+        external_bfs.py. Only whole layers are expanded, so the number of
+        nodes is the size of the layers before the goal.
+        """
+        import external_bfs
+
+        context = self.context
+        moves, self.statistics.nodes, self.statistics.max_depth,\
+            self.statistics.layers = external_bfs.bfs(
+                self.initial_state.key, self.goal, context.side,
+                context.shifts, context.mask, maxnodes, self.memory_mb,
+                self.scratch_dir)
+        if moves is None:
+            return None
+        return self.replay(moves)
+
+    def fast(self, maxnodes):
+        """non-optimal solution by decomposition for large boards
+
+        Solves the board row by row and column by column down to the last
+        3x3, see decompose.py. The goal must have the zero element in a
+        corner. Boards smaller than 3x3 are solved by bfs. The number of
+        nodes is the number of moves before shortening, maxnodes is not
+        used.
+        """
+        import decompose
+
+        side = self.context.side
+        if side < 3:
+            return self.bfs(maxnodes)
+        board = self.initial_state.state
+        moves = decompose.solve(board, self.goal_array, side)
+        self.statistics.nodes = len(moves)
+        if self.shorten:
+            self.statistics.raw_cost = len(moves)
+            moves = decompose.shorten(board, moves, side)
+        self.statistics.max_depth = len(moves)
+        return self.replay(moves)
+
+    def dls(self, maxnodes):
+        """depth-first search down to max_depth
+
+        Gives the first path found, which is usually not the shortest.
+        """
+        moves = self._depth_limited(self.max_depth, maxnodes)
+        if moves is None:
+            return None
+        return self.replay(moves)
+
+    def iddfs(self, maxnodes):
+        """iterative-deepening depth-first search
+
+        Depth-limited searches with the limit growing by 2 (every path to
+        the goal has the parity of the distance of the zero element to its
+        goal cell), so the first path found is the shortest one. Gives
+        up after max_depth if it is given.
+        """
+        zero = self.initial_state.zero_index
+        goal_zero = self.context.goal_zero
+        side = self.context.side
+        limit = abs(zero // side - goal_zero // side) +\
+            abs(zero % side - goal_zero % side)
+        while self.max_depth is None or limit <= self.max_depth:
+            moves = self._depth_limited(limit, maxnodes)
+            if moves is not None:
+                return self.replay(moves)
+            if self.statistics.nodes > maxnodes:
+                return None
+            limit += 2
+
+    def _depth_limited(self, limit, maxnodes):
+        """depth-first search from the initial state down to the limit
+
+        Memory is O(limit): the stack of move iterators, the moves and
+        the set of the configurations on the current path, which are not
+        entered again. The optional transposition table (at most
+        table_size configurations) keeps the smallest depth at which a
+        configuration was reached, deeper visits are pruned. Appends
+        (limit, generated nodes) to statistics.iterations.
+
+        Returns
+        -------
+        list[str] or None
+            moves to the goal, None if not found or maxnodes exceeded
+        """
+        context = self.context
+        stats = self.statistics
+        moves = context.moves
+        key = self.initial_state.key
+        zero = self.initial_state.zero_index
+        if key == self.goal:
+            stats.iterations.append((limit, 0))
+            return []
+        table = {key: 0} if self.table_size else None
+        on_path = {key}
+        # configuration, zero index, iterator of its moves, zero index of
+        # the parent
+        stack = [(key, zero, iter(moves[zero]), -1)]
+        path = []
+        generated = 0
+        stats.nodes += 1
+        found = None
+        while stack and found is None and stats.nodes <= maxnodes:
+            key, zero, children, back = stack[-1]
+            depth = len(stack)
+            for direction, new_zero, _ in children:
+                if new_zero == back:
+                    continue
+                new_key = swap(key, zero, new_zero, context)[0]
+                generated += 1
+                if new_key in on_path:
+                    continue
+                if table is not None:
+                    seen = table.get(new_key)
+                    if seen is not None and seen <= depth:
+                        continue
+                    if seen is not None or len(table) < self.table_size:
+                        table[new_key] = depth
+                if new_key == self.goal:
+                    found = path + [DIRECTIONS[direction]]
+                    break
+                if depth < limit:
+                    path.append(DIRECTIONS[direction])
+                    on_path.add(new_key)
+                    stack.append((new_key, new_zero, iter(moves[new_zero]),
+                                  zero))
+                    stats.nodes += 1
+                    if depth > stats.max_depth:
+                        stats.max_depth = depth
+                    break
+            else:
+                stack.pop()
+                on_path.discard(key)
+                if path:
+                    path.pop()
+        stats.iterations.append((limit, generated))
+        return found
+
+    def replay(self, moves):
+        """apply moves to the initial state
+
+        The moves are saved as statistics.moves.
+
+        Parameters
+        ----------
+        moves : list[str]
+            directions of the zero element moves
+
+        Returns
+        -------
+        PuzzleState
+            the last state, not linked to the states before it
+        """
+        context = self.context
+        side = context.side
+        shift = {"U": -side, "D": side, "L": -1, "R": 1}
+        key = self.initial_state.key
+        zero = self.initial_state.zero_index
+        for direction in moves:
+            new_zero = zero + shift[direction]
+            key = swap(key, zero, new_zero, context)[0]
+            zero = new_zero
+        self.statistics.moves = list(moves)
+        state = PuzzleState(key=key, zero_index=zero, context=context,
+                            direction=moves[-1] if moves else '')
+        state.depth = len(moves)
+        return state
 
     def get_path(self):
-        """add the full path of final element to the statistics object"""
-        self.statistics.path = [self.final_state]
-        moves = [self.final_state.direction]
-        par = self.final_state.parent
-        while par:
-            self.statistics.path.append(par)
-            moves.append(par.direction)
-            par = par.parent
-        self.statistics.path = self.statistics.path[::-1]
-        self.statistics.moves = moves[-2::-1]
+        """add the moves (unless replay() saved them) and the lazy path of
+        final element to the statistics object"""
+        state = self.final_state
+        if state.parent is not None:
+            # a node of the search, linked to the initial state
+            moves = []
+            while state.parent:
+                moves.append(state.direction)
+                state = state.parent
+            self.statistics.moves = moves[::-1]
+        self.statistics.path = Path(self.initial_state, self.statistics.moves)
 
     def print_stats(self, print_path):
         """print the statistics of the search process and (optionally) final path
@@ -406,32 +1306,188 @@ class Solver():
             print("path_to_goal: ", self.statistics.moves)
         print("cost_of_path: ", len(self.statistics.moves))
         print("nodes_expanded: ", self.statistics.nodes)
+        if self.statistics.cached:
+            print("cached: ", True)
+        if self._method in ("ast", "idastar"):
+            print("heuristic: ", self.statistics.heuristic)
         if self.final_state:
             print("search_depth: ", self.final_state.depth)
+        if self.statistics.lower_bound is not None:
+            print("lower_bound: ", self.statistics.lower_bound)
+        if self.statistics.suboptimality is not None:
+            print("suboptimality: ", round(self.statistics.suboptimality, 3))
         print("max_depth: ", self.statistics.max_depth)
-        print("running_time: ",
-              round(time.time() - self.statistics.start_time, 3), "s")
+        if self.statistics.raw_cost is not None:
+            print("cost_before_shortening: ", self.statistics.raw_cost)
+        if self.statistics.iterations:
+            print("nodes_generated_per_iteration: ",
+                  dict(self.statistics.iterations))
+        for layer in self.statistics.layers:
+            print("layer {depth}: states {states} runs {runs} "
+                  "bytes_read {read} bytes_written {written}".format(**layer))
+        print("running_time: ", round(self.statistics.total_time, 3), "s")
         print("max_ram_usage: {} MB"
               .format(resource.getrusage(RUSAGE_SELF)[2]/1000))
 
+    def report(self):
+        """statistics of the search as a JSON-serializable dict
+
+        Includes the data of the instrument if the solver has one.
+        """
+        stats = self.statistics
+        solved = self.final_state is not None
+        result = {
+            "method": self._method,
+            "heuristic": stats.heuristic,
+            "solved": solved,
+            "moves": stats.moves,
+            "cost": len(stats.moves) if solved else None,
+            "nodes": stats.nodes,
+            "search_depth": self.final_state.depth if solved else None,
+            "max_depth": stats.max_depth,
+            "cached": stats.cached,
+            "time": round(stats.total_time, 6),
+            "nodes_per_sec": round(stats.nodes / stats.total_time)
+            if stats.total_time else 0,
+            "peak_rss_mb": resource.getrusage(RUSAGE_SELF).ru_maxrss / 1000}
+        if stats.lower_bound is not None:
+            result.update(lower_bound=stats.lower_bound,
+                          suboptimality=stats.suboptimality,
+                          solutions=stats.solutions)
+        if stats.raw_cost is not None:
+            result["cost_before_shortening"] = stats.raw_cost
+        if stats.iterations:
+            result["iterations"] = stats.iterations
+        if stats.layers:
+            result["layers"] = stats.layers
+        if self.instrument is not None:
+            result.update(self.instrument.to_dict())
+        if self.cache is not None:
+            result["cache"] = self.cache.stats()
+        return result
+
     def check_solvability(self):
-        global side
-        return parity(self.initial_state.state) ==\
-               parity(self.goal_array) * (-1)**(side + 1)
+        return solvable(self.initial_state.state, self.goal_array)
 
 
 @dataclass
 class Stats():
+    heuristic: str = ""
     nodes: int = 0
     max_depth: int = 0
-    path: List[PuzzleState] = field(default_factory=list)
+    # states from the initial one to the goal, made when iterated
+    path: Path = field(default_factory=Path)
     moves: List[str] = field(default_factory=list)
     start_time: float = field(default_factory=time.time)
     end_time: float = 0.0
     total_time: float = 0.0
+    # anytime ast: proven lower bound of the optimal cost, cost divided
+    # by it and (seconds, cost, weight) of every solution found
+    lower_bound: int = None
+    suboptimality: float = None
+    solutions: List[tuple] = field(default_factory=list)
+    # the moves were taken from the solution cache
+    cached: bool = False
+    # dls and iddfs: (depth limit, generated nodes) of every iteration
+    iterations: List[tuple] = field(default_factory=list)
+    # ebfs: depth, states, run files, bytes read and written of every layer
+    layers: List[dict] = field(default_factory=list)
+    # fast: number of moves before the cycles were removed
+    raw_cost: int = None
+
+
+@dataclass(frozen=True)
+class Context():
+    """board geometry and goal data, made by context() once for a goal
+    and shared by all the solvers and states with this goal
+
+    Attributes
+    ----------
+        side, size : int
+            side of the board and number of cells
+        shifts : tuple[int]
+            bit offset of every position in a packed configuration
+        mask : int
+            mask of one tile code
+        tile_codes, code_tiles : tuple[int]
+            code of every tile and tile of every code, codes are the ranks
+            of the decimal strings of the tiles
+        goal : tuple[int]
+            goal tiles configuration
+        goal_key : int
+            packed goal
+        goal_zero : int
+            index of the zero element in the goal
+        coords_goal : tuple[tuple(int, int)]
+            row and column of every tile in the goal
+        moves : list
+            move_table() of the side
+    """
+    side: int
+    size: int
+    shifts: Tuple[int, ...]
+    mask: int
+    tile_codes: Tuple[int, ...]
+    code_tiles: Tuple[int, ...]
+    goal: Tuple[int, ...]
+    goal_key: int
+    goal_zero: int
+    coords_goal: Tuple[tuple, ...]
+    moves: list
+
+
+@contextmanager
+def gc_paused():
+    """the cyclic garbage collector is disabled inside the block
+
+    A full collection goes over all the states of a large search and
+    stops it for up to a tenth of a second, while the states make no
+    reference cycles. Thread-safe, the collector is enabled again when
+    the last of the concurrent blocks ends, if it was enabled before the
+    first one.
+    """
+    global _gc_pauses, _gc_enabled
+    with _gc_lock:
+        if not _gc_pauses:
+            _gc_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_pauses -= 1
+            if not _gc_pauses and _gc_enabled:
+                gc.enable()
+
 
+def context(goal):
+    """the Context of the goal, built on the first call
 
-def coords_2d(arr):
+    Thread-safe, the same object is returned for equal goals.
+    """
+    goal = tuple(goal)
+    with _contexts_lock:
+        if goal not in _contexts:
+            size = len(goal)
+            side = int(math.sqrt(size))
+            bits = max(4, (size - 1).bit_length())
+            code_tiles = sorted(range(size), key=str)
+            tile_codes = [0] * size
+            for code, tile in enumerate(code_tiles):
+                tile_codes[tile] = code
+            coords_goal = [None] * size
+            for i, tile in enumerate(goal):
+                coords_goal[tile] = divmod(i, side)
+            result = Context(
+                side, size, tuple((size - 1 - i) * bits for i in range(size)),
+                (1 << bits) - 1, tuple(tile_codes), tuple(code_tiles), goal,
+                0, goal.index(0), tuple(coords_goal), move_table(side))
+            _contexts[goal] = replace(result, goal_key=pack(goal, result))
+        return _contexts[goal]
+
+
+def coords_2d(arr, context):
     """transform an array to the 2d coordinates
 
         Returns
@@ -440,8 +1496,7 @@ def coords_2d(arr):
             keys are an initial array and values -
             a tuples of x and y coordinates
     """
-    # side = int(math.sqrt(len(arr)))
-    global side
+    side = context.side
     return {num: (i//side, i % side) for i, num in enumerate(arr)}
 
 
@@ -456,3 +1511,151 @@ def parity(nums):
                 nums[i], nums[i+1] = nums[i+1], nums[i]
                 par *= -1
     return par
+
+
+def solvable(board, goal):
+    """True if the goal can be reached from the board
+
+    Every move of the zero element keeps the parity of the tiles
+    permutation on boards with an odd side. On even boards a vertical move
+    changes it, together with the row of the zero element.
+    """
+    size = int(math.sqrt(len(board)))
+    if size % 2:
+        return parity(board) == parity(goal)
+    return parity(board) * (-1)**(board.index(0) // size) ==\
+        parity(goal) * (-1)**(goal.index(0) // size)
+
+
+def move_table(size):
+    """legal moves of the zero element for every position on the board
+
+    Arguments
+    ---------
+    size : int
+        side of the board
+
+    Returns
+    -------
+    tuple(tuple(tuple(int, int, int)))
+        for every position of the zero element the moves in order "UDLR":
+        direction (index in DIRECTIONS), new position of the zero element
+        and the index of the tile move for Heuristic.delta, that is
+        the new zero position * 4 + the direction of the tile
+    """
+    if size not in _move_tables:
+        table = []
+        for zero in range(size * size):
+            row, col = divmod(zero, size)
+            moves = []
+            for direction, shift, legal in ((0, -size, row > 0),
+                                            (1, size, row < size - 1),
+                                            (2, -1, col > 0),
+                                            (3, 1, col < size - 1)):
+                if legal:
+                    # the tile moves in the opposite direction
+                    moves.append((direction, zero + shift,
+                                  (zero + shift) * 4 + (direction ^ 1)))
+            table.append(tuple(moves))
+        _move_tables[size] = tuple(table)
+    return _move_tables[size]
+
+
+def canonical_goal(size, zero):
+    """goal with the zero element at index ``zero`` and the other tiles
+    in ascending order: 0,1,2,... for zero 0 and 1,2,...,0 for the last
+    index"""
+    goal = list(range(1, size))
+    goal.insert(zero, 0)
+    return goal
+
+
+def parse_state(text):
+    """tiles configuration from a string in format: 0,1,2,3 etc
+
+    Raises
+    ------
+    ValueError
+        if the numbers are not a permutation of 0..n-1 or n is not a
+        square of an integer
+    """
+    state = list(map(int, text.split(",")))
+    if (list(range(len(state))) != sorted(state)):
+        raise ValueError("Wrong initial state! Check if all numbers are here")
+    if (math.sqrt(len(state)) != round(math.sqrt(len(state)))):
+        raise ValueError("Wrong initial state! Check the array size")
+    return state
+
+
+def swap(key, zero, new_zero, context):
+    """move a zero element of the packed configuration to new_zero
+
+        Returns
+        -------
+        tuple(int, int)
+            new key and the code of the moved tile
+    """
+    shifts = context.shifts
+    code = (key >> shifts[new_zero]) & context.mask
+    return key + (code << shifts[zero]) - (code << shifts[new_zero]), code
+
+
+def neighbours(key, zero, context):
+    """generator of the moves of a zero element in order \"UDLR\"
+
+        Yields
+        -------
+        tuple(str, int, int)
+            direction, new key and new index of the zero element
+    """
+    for direction, new_zero, _ in context.moves[zero]:
+        yield DIRECTIONS[direction], swap(key, zero, new_zero, context)[0],\
+            new_zero
+
+
+def join_paths(key, forward, backward):
+    """directions from the initial state to the goal through ``key``
+
+        Arguments
+        ---------
+        key : int
+            packed configuration reached by both searches
+        forward, backward : dict
+            packed configuration -> (parent configuration, direction)
+            for the searches from the initial state and from the goal
+    """
+    moves = []
+    node = forward[key]
+    while node:
+        moves.append(node[1])
+        node = forward[node[0]]
+    moves.reverse()
+    node = backward[key]
+    while node:
+        moves.append(OPPOSITE[node[1]])
+        node = backward[node[0]]
+    return moves
+
+
+def pack(arr, context):
+    """pack a tiles configuration into an integer
+
+        Returns
+        -------
+        int
+            code of the tile at position i is stored starting from
+            bit shifts[i], the first tile is the most significant one
+    """
+    shifts, tile_codes = context.shifts, context.tile_codes
+    key = 0
+    for i, num in enumerate(arr):
+        key |= tile_codes[num] << shifts[i]
+    return key
+
+
+def unpack(key, context):
+    """inverse of pack(): restore the list of tiles from the key"""
+    shifts, mask, code_tiles = context.shifts, context.mask,\
+        context.code_tiles
+    return [code_tiles[(key >> shifts[i]) & mask]
+            for i in range(context.size)]
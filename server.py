@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Solve service: an asyncio server with a JSON-lines protocol
+
+Every line sent to the server is a request, for example
+
+    {"id": 1, "board": "8,6,4,2,1,3,5,7,0", "method": "ast",
+     "zl": false, "heuristic": "manhattan", "maxnodes": 100000,
+     "timeout": 5}
+
+and every line sent back is a response with the same "id" and the fields
+of batch.solve_one() (moves, cost, nodes, ...) or an "error" field. Only
+"board" is required. Responses of one connection may come in a different
+order than the requests. {"op": "stats"} returns the counters of the
+service.
+
+The searches run in a process pool. Identical requests in flight are
+merged: the later ones wait for the result of the first one and get
+"coalesced": true. Backpressure is applied on two levels: a connection
+is not read while it has ``per_connection`` requests in flight, and
+requests beyond ``max_pending`` searches in the pool are rejected with
+the error "busy". Node and time limits of a request can only lower the
+limits of the server. A search can not be stopped in the worker, so
+after a timeout it still runs to its node limit and its result is used
+by the requests merged with it.
+"""
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from batch import solve_one
+from heuristics import HEURISTICS
+from search import OPTIMAL_METHODS, parse_state
+
+METHODS = OPTIMAL_METHODS + ("dfs",)
+
+
+class SolveService():
+    """solver pool with request coalescing
+
+    Arguments
+    ----------
+    workers : int, optional
+        number of processes, by default the number of CPUs
+    max_pending : int
+        maximum number of searches in the pool, default 64
+    per_connection : int
+        maximum number of requests in flight of one connection, default 16
+    max_nodes : int
+        node limit of a search, default 1 000 000
+    timeout : float
+        time limit of a request in seconds, default 30
+    cache : str, optional
+        sqlite file of the solution cache of the workers
+
+    Attributes
+    ----------
+        counters : dict
+            numbers of the requests, searches, coalesced, rejected and
+            timed out requests and errors
+    """
+    def __init__(self, workers=None, max_pending=64, per_connection=16,
+                 max_nodes=1000000, timeout=30.0, cache=None):
+        self.max_pending = max_pending
+        self.per_connection = per_connection
+        self.max_nodes = max_nodes
+        self.timeout = timeout
+        self.cache = cache
+        self._pool = ProcessPoolExecutor(workers or os.cpu_count())
+        # request key -> future of the search
+        self._inflight = {}
+        self.counters = dict.fromkeys(("requests", "searches", "coalesced",
+                                       "rejected", "timeouts", "errors"), 0)
+
+    def _finished(self, key, future):
+        del self._inflight[key]
+        if not future.cancelled():
+            # retrieved here too, as all the requests may have timed out
+            future.exception()
+
+    async def solve(self, request):
+        """response to one request"""
+        self.counters["requests"] += 1
+        response = {"id": request.get("id")}
+        try:
+            board = ",".join(map(str, parse_state(str(request["board"]))))
+            method = request.get("method", "ast")
+            if not isinstance(method, str) or method not in METHODS:
+                raise ValueError("Unknown method {}, use one of: {}"
+                                 .format(method, ", ".join(METHODS)))
+            heuristic = request.get("heuristic", "manhattan")
+            if not isinstance(heuristic, str) or heuristic not in HEURISTICS:
+                raise ValueError("Unknown heuristic {}, use one of: {}"
+                                 .format(heuristic, ", ".join(HEURISTICS)))
+            zl = request.get("zl", False)
+            if not isinstance(zl, bool):
+                raise TypeError("zl must be a boolean")
+            options = {"zl": zl,
+                       "heuristic": heuristic,
+                       "maxnodes": min(int(request.get("maxnodes",
+                                                       self.max_nodes)),
+                                       self.max_nodes),
+                       "cache": self.cache}
+            timeout = min(float(request.get("timeout", self.timeout)),
+                          self.timeout)
+        except (KeyError, ValueError, TypeError) as e:
+            self.counters["errors"] += 1
+            response["error"] = "bad request: {}".format(e)
+            return response
+
+        key = (board, method, options["zl"], options["heuristic"],
+               options["maxnodes"])
+        future = self._inflight.get(key)
+        coalesced = future is not None
+        if coalesced:
+            self.counters["coalesced"] += 1
+        elif len(self._inflight) >= self.max_pending:
+            self.counters["rejected"] += 1
+            response["error"] = "busy"
+            return response
+        else:
+            self.counters["searches"] += 1
+            future = asyncio.get_running_loop().run_in_executor(
+                self._pool, solve_one, (0, board, method, options))
+            self._inflight[key] = future
+            future.add_done_callback(
+                lambda future: self._finished(key, future))
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            response["error"] = "timeout"
+            return response
+        except Exception as e:
+            # the worker process failed, for example it was killed
+            self.counters["errors"] += 1
+            response["error"] = "{}: {}".format(type(e).__name__, e)
+            return response
+        response.update(result)
+        del response["index"]
+        response["coalesced"] = coalesced
+        return response
+
+    async def _respond(self, line, writer, slots):
+        try:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("a request must be a JSON object")
+            except ValueError as e:
+                self.counters["errors"] += 1
+                response = {"id": None, "error": "bad request: {}".format(e)}
+            else:
+                if request.get("op") == "stats":
+                    response = {"id": request.get("id"),
+                                "stats": dict(self.counters,
+                                              inflight=len(self._inflight))}
+                else:
+                    try:
+                        response = await self.solve(request)
+                    except Exception as e:
+                        # every request gets a response line
+                        self.counters["errors"] += 1
+                        response = {"id": request.get("id"),
+                                    "error": "{}: {}".format(
+                                        type(e).__name__, e)}
+            writer.write((json.dumps(response) + "\n").encode())
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            slots.release()
+
+    async def handle(self, reader, writer):
+        """serve one connection"""
+        slots = asyncio.Semaphore(self.per_connection)
+        tasks = set()
+        try:
+            while True:
+                # with per_connection requests in flight the socket is not
+                # read, so a fast client is slowed down by TCP
+                await slots.acquire()
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    slots.release()
+                    continue
+                task = asyncio.ensure_future(
+                    self._respond(line, writer, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        self._pool.shutdown(cancel_futures=True)
+
+
+async def serve(service, host="127.0.0.1", port=8765, unix=None):
+    """start listening on a TCP port or a Unix socket
+
+    Returns
+    -------
+    asyncio.base_events.Server
+    """
+    if unix is not None:
+        return await asyncio.start_unix_server(service.handle, path=unix)
+    return await asyncio.start_server(service.handle, host, port)
+
+
+async def main(args):
+    service = SolveService(args.workers, args.max_pending,
+                           args.per_connection, int(args.nodes),
+                           args.timeout, args.cache)
+    server = await serve(service, args.host, args.port, args.unix)
+    print("listening on", args.unix or "{}:{}".format(args.host, args.port),
+          flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description="solve service with a JSON-lines protocol")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address to listen on, default 127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=8765,
+                        help="TCP port, default 8765")
+    parser.add_argument("-u", "--unix", default=None,
+                        help="Unix socket path instead of the TCP port")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="number of processes, default number of CPUs")
+    parser.add_argument("--max-pending", type=int, default=64,
+                        help="searches in the pool before new requests\
+                        are rejected, default 64")
+    parser.add_argument("--per-connection", type=int, default=16,
+                        help="requests in flight of one connection,\
+                        default 16")
+    parser.add_argument("-n", "--nodes", default='1000000',
+                        help="maximum number of nodes of a search,\
+                        default 1 000 000")
+    parser.add_argument("-t", "--timeout", type=float, default=30.0,
+                        help="maximum time of a request in seconds,\
+                        default 30")
+    parser.add_argument("--cache", default=None,
+                        help="sqlite file of the solution cache")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        pass
@@ -1,4 +1,28 @@
+import asyncio
+import gc
+import importlib.util
+import json
+import os
+import random
+import tempfile
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import batch
+import decompose
+import distance_table
+import benchmark
+import external_bfs
+import heuristics
+import loadgen
+import patterndb
+import search
+import server
+from backward_bfs import BackwardSearch
+from cache import SolutionCache
+from instrument import Instrument
 from search import Solver
 
 
@@ -38,6 +62,28 @@ class TestPuzzle(unittest.TestCase):
         self.assertEqual(solver.statistics.nodes, 54094)
         self.assertEqual(solver.statistics.moves, ['D', 'R', 'U', 'U', 'L', 'D', 'R', 'D', 'L', 'U', 'L', 'U', 'R', 'R', 'D', 'D', 'L', 'L', 'U', 'U'])
 
+    def test_path(self):
+        solver = Solver("bfs", self.puzzle_3_2)
+        final_state = solver.solve()
+        path = list(solver.statistics.path)
+        self.assertEqual(len(path), len(solver.statistics.path))
+        self.assertEqual(len(path), 21)
+        self.assertEqual(path[0].state, self.puzzle_3_2)
+        self.assertEqual(path[-1].state, final_state.state)
+        self.assertEqual([state.direction for state in path[1:]],
+                         solver.statistics.moves)
+        self.assertTrue(all(state.parent is None for state in path))
+        # the final state is not linked to the path
+        self.assertIsNone(final_state.parent)
+        self.assertEqual(final_state.depth, 20)
+        # directions of the moves are packed four in a byte
+        nodes = search.NodeStore(solver.initial_state.key, 4,
+                                 solver.context)
+        for i, direction in enumerate([3, 1, 2, 0, 3, 3]):
+            nodes.add(i, 4, i, direction)
+        self.assertEqual(len(nodes.directions), 2)
+        self.assertEqual(nodes.moves(6), list("RDLURR"))
+
     def test_dfs1(self):
         solver = Solver("dfs", self.puzzle_3_1)
         _ = solver.solve()
@@ -60,6 +106,484 @@ class TestPuzzle(unittest.TestCase):
         self.assertEqual(solver.statistics.moves, ['D', 'L', 'L', 'L', 'U', 'U', 'R', 'R', 'R', 'D', 'D', 'L', 'L', 'L', 'U', 'R', 'R', 'D', 'L', 'U', 'U', 'R', 'R', 'D', 'D', 'L', 'L', 'U', 'L', 'U', 'R', 'R', 'R', 'D', 'D']
 )
 
+    def test_idastar1(self):
+        solver = Solver("idastar", self.puzzle_3_1)
+        _ = solver.solve()
+        print(round(solver.statistics.total_time, 3), " s")
+        self.assertEqual(solver.statistics.max_depth, 26)
+        self.assertEqual(solver.statistics.moves, ['L', 'U', 'U', 'L', 'D', 'R', 'D', 'L', 'U', 'R', 'R', 'U', 'L', 'L', 'D', 'R', 'R', 'U', 'L', 'D', 'D', 'R', 'U', 'L', 'U', 'L'])
+
+    def test_idastar2(self):
+        solver = Solver("idastar", self.puzzle_3_2)
+        _ = solver.solve()
+        print(round(solver.statistics.total_time, 3), " s")
+        self.assertEqual(solver.statistics.max_depth, 20)
+        self.assertEqual(solver.statistics.moves, ['D', 'R', 'U', 'U', 'L', 'D', 'R', 'D', 'L', 'U', 'L', 'U', 'R', 'R', 'D', 'D', 'L', 'L', 'U', 'U'])
+
+    def test_idastar3(self):
+        solver = Solver("idastar", self.puzzle_4_zl, zl=True)
+        final_state = solver.solve()
+        print(round(solver.statistics.total_time, 3), " s")
+        self.assertEqual(len(solver.statistics.moves), 35)
+        self.assertEqual(final_state.state, solver.goal_array)
+
+    def test_bibfs1(self):
+        solver = Solver("bibfs", self.puzzle_3_1)
+        final_state = solver.solve()
+        print(round(solver.statistics.total_time, 3), " s")
+        self.assertEqual(solver.statistics.nodes, 3296)
+        self.assertEqual(len(solver.statistics.moves), 26)
+        self.assertEqual(final_state.state, solver.goal_array)
+
+    def test_bibfs2(self):
+        solver = Solver("bibfs", self.puzzle_3_2)
+        final_state = solver.solve()
+        print(round(solver.statistics.total_time, 3), " s")
+        self.assertEqual(solver.statistics.nodes, 842)
+        self.assertEqual(len(solver.statistics.moves), 20)
+        self.assertEqual(final_state.state, solver.goal_array)
+
+    def test_table(self):
+        solver = Solver("table", self.puzzle_3_1)
+        final_state = solver.solve()
+        print(round(solver.statistics.total_time, 3), " s")
+        self.assertEqual(solver.statistics.moves, ['L', 'U', 'U', 'L', 'D', 'R', 'D', 'L', 'U', 'R', 'R', 'U', 'L', 'L', 'D', 'R', 'R', 'U', 'L', 'D', 'D', 'R', 'U', 'L', 'U', 'L'])
+        self.assertEqual(final_state.state, solver.goal_array)
+        solver = Solver("table", self.puzzle_3_2, zl=True)
+        final_state = solver.solve()
+        self.assertEqual(final_state.state, solver.goal_array)
+        self.assertEqual(len(solver.statistics.moves),
+                         solver.statistics.max_depth)
+        # a cached table is not returned for another goal
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "table.bin")
+            table = distance_table.load(2, [0, 1, 2, 3], path)
+            self.assertIs(distance_table.load(2, [0, 1, 2, 3], path), table)
+            with self.assertRaises(ValueError):
+                distance_table.load(2, [1, 2, 3, 0], path)
+            distance_table._loaded.pop(path).close()
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "needs numpy")
+    def test_npbfs1(self):
+        solver = Solver("npbfs", self.puzzle_3_1)
+        _ = solver.solve()
+        print(round(solver.statistics.total_time, 3), " s")
+        self.assertEqual(solver.statistics.max_depth, 27)
+        self.assertEqual(solver.statistics.nodes, 166786)
+        self.assertEqual(solver.statistics.moves, ['L', 'U', 'U', 'L', 'D', 'R', 'D', 'L', 'U', 'R', 'R', 'U', 'L', 'L', 'D', 'R', 'R', 'U', 'L', 'D', 'D', 'R', 'U', 'L', 'U', 'L'])
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "needs numpy")
+    def test_npbfs2(self):
+        solver = Solver("npbfs", self.puzzle_3_2)
+        _ = solver.solve()
+        print(round(solver.statistics.total_time, 3), " s")
+        self.assertEqual(solver.statistics.max_depth, 21)
+        self.assertEqual(solver.statistics.nodes, 54094)
+        self.assertEqual(solver.statistics.moves, ['D', 'R', 'U', 'U', 'L', 'D', 'R', 'D', 'L', 'U', 'L', 'U', 'R', 'R', 'D', 'D', 'L', 'L', 'U', 'U'])
+
+    def test_ebfs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # a small buffer: several run files per layer
+            solver = Solver("ebfs", self.puzzle_3_1, memory_mb=0.2,
+                            scratch_dir=directory)
+            final_state = solver.solve()
+            print(round(solver.statistics.total_time, 3), " s")
+            self.assertEqual(final_state.state, solver.goal_array)
+            self.assertEqual(len(solver.statistics.moves), 26)
+            self.assertEqual(solver.statistics.max_depth, 26)
+            layers = solver.statistics.layers
+            self.assertEqual([layer["depth"] for layer in layers],
+                             list(range(27)))
+            self.assertGreater(max(layer["runs"] for layer in layers), 1)
+            self.assertTrue(all(layer["written"] for layer in layers))
+            self.assertEqual(os.listdir(directory), [])
+        # all the states of the 3x3 board
+        goal = search.context(range(9))
+        _, nodes, depth, layers = external_bfs.bfs(
+            goal.goal_key, None, 3, goal.shifts, goal.mask, float("inf"))
+        self.assertEqual(nodes, 181440)
+        self.assertEqual(depth, 31)
+        self.assertEqual([layer["states"] for layer in layers[-3:]],
+                         [760, 221, 2])
+
+    def test_fast(self):
+        rnd = random.Random(0)
+        for side in range(3, 8):
+            for zl in (False, True):
+                board = benchmark.random_board(side, rnd)
+                if zl and side % 2 == 0:
+                    # the goals 0,1,2... and 1,2,...,0 differ in parity on
+                    # even boards
+                    board[-1], board[-2] = board[-2], board[-1]
+                solver = Solver("fast", board, zl=zl)
+                final_state = solver.solve()
+                self.assertEqual(final_state.state, solver.goal_array)
+                self.assertLessEqual(len(solver.statistics.moves),
+                                     solver.statistics.raw_cost)
+        self.assertEqual(decompose.shorten([1, 0, 2, 3], "LRLD", 2),
+                         ["L", "D"])
+        # three turns of the empty cell around a 2x2 restore the board
+        self.assertEqual(decompose.shorten([1, 0, 2, 3], "DLUR" * 3, 2), [])
+        self.assertEqual(decompose.shorten([1, 0, 2, 3], "DLUR" * 4, 2),
+                         list("DLUR"))
+
+    def test_iddfs(self):
+        solver = Solver("iddfs", self.puzzle_3_2)
+        _ = solver.solve()
+        print(round(solver.statistics.total_time, 3), " s")
+        self.assertEqual(len(solver.statistics.moves), 20)
+        self.assertEqual([limit for limit, _ in solver.statistics.iterations],
+                         list(range(2, 21, 2)))
+        with_table = Solver("iddfs", self.puzzle_3_2, table_size=100000)
+        _ = with_table.solve()
+        self.assertEqual(len(with_table.statistics.moves), 20)
+        self.assertLess(with_table.statistics.nodes, solver.statistics.nodes)
+        # 16 moves on the 4x4 board, too far for dfs
+        board = [1,10,2,3,5,11,6,4,9,8,15,7,13,14,12,0]
+        solver = Solver("iddfs", board, zl=True)
+        final_state = solver.solve()
+        self.assertEqual(final_state.state, solver.goal_array)
+        self.assertEqual(len(solver.statistics.moves), 16)
+        solver = Solver("iddfs", board, zl=True, max_depth=14)
+        self.assertIsNone(solver.solve())
+
+    def test_dls(self):
+        solver = Solver("dls", self.puzzle_3_2, max_depth=30)
+        final_state = solver.solve()
+        self.assertEqual(final_state.state, solver.goal_array)
+        self.assertLessEqual(len(solver.statistics.moves), 30)
+        self.assertRaises(ValueError, Solver, "dls", self.puzzle_3_2)
+
+    def test_hdastar(self):
+        for board, zl, cost in ((self.puzzle_3_1, False, 26),
+                                (self.puzzle_4_zl, True, 35)):
+            solver = Solver("hdastar", board, zl=zl, workers=2)
+            final_state = solver.solve()
+            print(round(solver.statistics.total_time, 3), " s")
+            self.assertEqual(final_state.state, solver.goal_array)
+            self.assertEqual(len(solver.statistics.moves), cost)
+
+    def test_pdb(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "pdb_4_4.bin")
+            patterndb.build(path, 3, list(range(9)),
+                            patterndb.partition(3, [4, 4]))
+            for method in ("ast", "idastar"):
+                manhattan = Solver(method, self.puzzle_3_1)
+                manhattan.solve()
+                solver = Solver(method, self.puzzle_3_1, heuristic="pdb",
+                                pdb_path=path)
+                final_state = solver.solve()
+                print(round(solver.statistics.total_time, 3), " s")
+                self.assertEqual(len(solver.statistics.moves), 26)
+                self.assertEqual(final_state.state, solver.goal_array)
+                self.assertLess(solver.statistics.nodes,
+                                manhattan.statistics.nodes)
+            patterndb._loaded.pop(path).close()
+            # builders of the same file at once do not clash
+            path = os.path.join(tmp, "pdb_concurrent.bin")
+            groups = patterndb.partition(3, [4, 4])
+            with ThreadPoolExecutor(4) as executor:
+                list(executor.map(
+                    lambda _: patterndb.build(path, 3, list(range(9)),
+                                              groups), range(4)))
+            self.assertEqual(os.listdir(tmp).count("pdb_concurrent.bin"), 1)
+            self.assertFalse([name for name in os.listdir(tmp)
+                              if name.endswith(".tmp")])
+            database = patterndb.load(3, list(range(9)), groups, path)
+            self.assertEqual(database.groups, groups)
+            # the goal is checked also when the database is cached
+            with self.assertRaises(ValueError):
+                patterndb.load(3, list(range(1, 9)) + [0], groups, path)
+            patterndb._loaded.pop(path).close()
+            # threads of one process build a missing database once
+            path = os.path.join(tmp, "pdb_threads.bin")
+            with mock.patch("patterndb.build",
+                            wraps=patterndb.build) as build,\
+                    ThreadPoolExecutor(4) as executor:
+                databases = list(executor.map(
+                    lambda _: patterndb.load(3, list(range(9)), groups, path),
+                    range(4)))
+            self.assertEqual(build.call_count, 1)
+            self.assertTrue(all(d is databases[0] for d in databases))
+            patterndb._loaded.pop(path).close()
+
+    def test_heuristics(self):
+        for name in ("manhattan", "linear_conflict", "walking_distance"):
+            solver = Solver("ast", self.puzzle_3_1, heuristic=name)
+            final_state = solver.solve()
+            print(name, round(solver.statistics.total_time, 3), " s")
+            self.assertEqual(len(solver.statistics.moves), 26)
+            self.assertEqual(final_state.state, solver.goal_array)
+            self.assertEqual(solver.statistics.heuristic, name)
+
+            goal = list(range(1, 16)) + [0]
+            heuristic = heuristics.get(name, 4, goal)
+            board = list(self.puzzle_4_zl)
+            dist, data = heuristic.evaluate(board)
+            zero = board.index(0)
+            for new_zero in (zero - 4, zero - 5, zero - 1, zero + 3):
+                tile = board[new_zero]
+                board[zero], board[new_zero] = tile, 0
+                dist, data = heuristic.update(dist, data, board, tile,
+                                              new_zero, zero)
+                zero = new_zero
+                self.assertEqual((dist, data), heuristic.evaluate(board))
+
+        # the heuristic is built only by the methods which use it
+        solver = Solver("bfs", self.puzzle_3_2, heuristic="pdb",
+                        pdb_path="no-such-file.bin")
+        solver.solve()
+        self.assertIsNone(solver._heuristic)
+        with self.assertRaises(ValueError):
+            Solver("bfs", self.puzzle_3_2, heuristic="euclid")
+
+    def test_batch(self):
+        states = [",".join(map(str, self.puzzle_3_1)),
+                  "1,0,2,3,4,5,6,8,7",
+                  ",".join(map(str, self.puzzle_3_2))]
+        results = list(batch.solve_batch(states, "ast", workers=2,
+                                         ordered=True))
+        self.assertEqual([r["index"] for r in results], [0, 1, 2])
+        self.assertEqual(results[0]["cost"], 26)
+        self.assertIn("error", results[1])
+        self.assertEqual(results[2]["moves"], ['D', 'R', 'U', 'U', 'L', 'D', 'R', 'D', 'L', 'U', 'L', 'U', 'R', 'R', 'D', 'D', 'L', 'L', 'U', 'U'])
+        # hdastar starts processes in the workers
+        results = list(batch.solve_batch(states, "hdastar", workers=2,
+                                         chunksize=2))
+        self.assertEqual(sorted(r.get("cost", -1) for r in results),
+                         [-1, 20, 26])
+        # any exception of a search is the error of its board
+        options = {"zl": False, "heuristic": "manhattan", "maxnodes": 1000}
+        with mock.patch.object(Solver, "bfs", side_effect=OSError("disk")):
+            result = batch.solve_one((0, states[0], "bfs", options))
+        self.assertEqual(result["error"], "OSError: disk")
+
+    def test_goal(self):
+        goal = [1, 2, 3, 8, 0, 4, 7, 5, 6]
+        costs = set()
+        for method in ("ast", "bibfs", "table"):
+            solver = Solver(method, self.puzzle_3_1, goal=goal)
+            final_state = solver.solve()
+            self.assertEqual(final_state.state, solver.goal_array)
+            costs.add(len(solver.statistics.moves))
+            # the moves lead the given board to the given goal
+            board = list(self.puzzle_3_1)
+            zero = board.index(0)
+            for direction in solver.statistics.moves:
+                new_zero = zero + {"U": -3, "D": 3, "L": -1, "R": 1}[direction]
+                board[zero], board[new_zero] = board[new_zero], 0
+                zero = new_zero
+            self.assertEqual(board, goal)
+        self.assertEqual(costs, {22})
+        # the same zero position: the tables are shared
+        other = Solver("ast", self.puzzle_3_2, goal=[8, 7, 6, 5, 0, 4, 3,
+                                                      2, 1])
+        self.assertIs(other.context, solver.context)
+        self.assertIs(other.heuristic, Solver("ast", self.puzzle_3_1,
+                                              goal=goal).heuristic)
+        # the default goals are canonical
+        solver = Solver("ast", self.puzzle_4_zl,
+                        goal=list(range(1, 16)) + [0])
+        self.assertIsNone(solver.labels)
+        solver.solve()
+        self.assertEqual(len(solver.statistics.moves), 35)
+        self.assertRaises(AttributeError, Solver, "ast", self.puzzle_3_1,
+                          goal=[1, 2, 3, 8, 0, 4, 7, 6, 5])
+        self.assertRaises(ValueError, Solver, "ast", self.puzzle_3_1,
+                          goal=list(range(16)))
+
+    def test_backward(self):
+        shared = BackwardSearch()
+        boards = ["8,6,4,2,1,3,5,7,0", "6,1,8,4,0,2,7,3,5",
+                  "1,0,2,3,4,5,6,8,7"]
+        results = list(shared.solve(boards))
+        self.assertEqual([r["index"] for r in results], [2, 1, 0])
+        self.assertIn("error", results[0])
+        self.assertEqual([r["cost"] for r in results[1:]], [20, 26])
+        for result in results[1:]:
+            solver = Solver("bfs", search.parse_state(result["initial"]))
+            self.assertEqual(solver.replay(result["moves"]).key, solver.goal)
+            self.assertFalse(result["reused"])
+        # the explored region is kept for the next call
+        expanded = shared.expanded
+        result, = shared.solve(["6,1,8,4,0,2,7,3,5"])
+        self.assertTrue(result["reused"])
+        self.assertEqual(shared.expanded, expanded)
+        # a window is answered before the next boards are read
+        read = []
+
+        def stream():
+            for board in boards:
+                read.append(board)
+                yield board
+        results = shared.solve(stream(), window=2)
+        self.assertEqual(next(results)["index"], 0)
+        self.assertEqual(len(read), 2)
+        self.assertEqual([r["index"] for r in results], [1, 2])
+        # the same tree for a goal with the empty cell in the same place
+        goal = [0,2,1,3,5,4,6,7,8]
+        result, = shared.solve([self.puzzle_3_1], goal=goal)
+        solver = Solver("ast", self.puzzle_3_1, goal=goal)
+        solver.solve()
+        self.assertEqual(result["cost"], len(solver.statistics.moves))
+        self.assertEqual(shared.stats()["goals"], 1)
+        # a tree of another goal is evicted, a too far board is not solved
+        shared = BackwardSearch(max_states=2000)
+        list(shared.solve([self.puzzle_3_2], zl=True))
+        result, = shared.solve([self.puzzle_3_1])
+        self.assertFalse(result["solved"])
+        self.assertEqual(shared.evictions, 1)
+        self.assertLessEqual(shared.stats()["states"], 2000)
+
+    def test_threads(self):
+        # boards of different sizes and goals solved at the same time
+        jobs = [(self.puzzle_3_1, False), (self.puzzle_3_2, True),
+                (self.puzzle_4_zl, True), (self.puzzle_3_2, False)] * 3
+        expected = []
+        for board, zl in jobs:
+            solver = Solver("ast", board, zl=zl)
+            solver.solve()
+            expected.append(solver.statistics.moves)
+        for zl in (False, True):
+            states = [",".join(map(str, board)) for board, z in jobs
+                      if z == zl]
+            results = list(batch.solve_threads(states, "ast", workers=4,
+                                               zl=zl, ordered=True))
+            self.assertEqual([r["moves"] for r in results],
+                             [moves for (_, z), moves in zip(jobs, expected)
+                              if z == zl])
+        self.assertIs(Solver("bfs", self.puzzle_3_1).context,
+                      Solver("ast", self.puzzle_3_2).context)
+        self.assertIsNot(Solver("bfs", self.puzzle_3_1).context,
+                         Solver("bfs", self.puzzle_3_1, zl=True).context)
+
+    def test_anytime(self):
+        solver = Solver("ast", self.puzzle_4_zl, zl=True, weight=3)
+        final_state = solver.solve()
+        stats = solver.statistics
+        self.assertEqual(final_state.state, solver.goal_array)
+        self.assertEqual(len(stats.moves), 35)
+        self.assertEqual(stats.lower_bound, 35)
+        self.assertEqual(stats.suboptimality, 1.0)
+        costs = [cost for _, cost, _ in stats.solutions]
+        self.assertEqual(costs, sorted(costs, reverse=True))
+        self.assertGreater(costs[0], 35)
+        # stopped early: the bound still holds
+        solver = Solver("ast", self.puzzle_4_zl, zl=True, weight=3)
+        _ = solver.solve(maxnodes=1500)
+        stats = solver.statistics
+        self.assertLessEqual(stats.lower_bound, 35)
+        self.assertGreaterEqual(len(stats.moves), 35)
+        self.assertEqual(stats.suboptimality,
+                         len(stats.moves) / stats.lower_bound)
+        # the deadline is counted from the creation of the solver; the
+        # garbage collector is paused only on request and runs again
+        # after the search
+        before = time.time()
+        for pause_gc in (False, True):
+            solver = Solver("ast", self.puzzle_4_zl, zl=True, weight=5,
+                            deadline_ms=50, pause_gc=pause_gc)
+            with mock.patch("gc.disable") as disable:
+                _ = solver.solve(maxnodes=10 ** 9)
+            self.assertEqual(disable.called, pause_gc)
+            self.assertGreaterEqual(solver.statistics.start_time, before)
+            self.assertTrue(gc.isenabled())
+
+    def test_instrument(self):
+        for method in ("bfs", "idastar", "ast"):
+            plain = Solver(method, self.puzzle_3_1)
+            _ = plain.solve()
+            snapshots = []
+            solver = Solver(method, self.puzzle_3_1,
+                            instrument=Instrument(snapshots.append, 100))
+            _ = solver.solve()
+            self.assertEqual(solver.statistics.nodes, plain.statistics.nodes)
+            self.assertEqual(solver.statistics.moves, plain.statistics.moves)
+            self.assertEqual(len(snapshots), solver.statistics.nodes // 100)
+            report = json.loads(json.dumps(solver.report()))
+            self.assertEqual(report["cost"], 26)
+            self.assertEqual(len(report["samples"]), len(snapshots))
+        # phase timers and exact list sizes are kept by ast only
+        self.assertGreater(report["phases"]["heap"], 0)
+        self.assertLessEqual(report["max_closed"], report["nodes"])
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.db")
+            cache = SolutionCache(maxsize=30, path=path)
+            solver = Solver("ast", self.puzzle_3_1, cache=cache)
+            _ = solver.solve()
+            self.assertFalse(solver.statistics.cached)
+            # reflection about the main diagonal, tile t -> its reflection
+            side = 3
+            reflect = [(i % side) * side + i // side for i in range(9)]
+            board = [reflect[self.puzzle_3_1[p]] for p in reflect]
+            solver = Solver("bfs", board, cache=cache)
+            final_state = solver.solve()
+            self.assertTrue(solver.statistics.cached)
+            self.assertEqual(final_state.state, solver.goal_array)
+            self.assertEqual(solver.statistics.moves, [
+                {"U": "L", "D": "R", "L": "U", "R": "D"}[m]
+                for m in ['L', 'U', 'U', 'L', 'D', 'R', 'D', 'L', 'U', 'R', 'R', 'U', 'L', 'L', 'D', 'R', 'R', 'U', 'L', 'D', 'D', 'R', 'U', 'L', 'U', 'L']])
+            # a suffix of the path, from the file by a new cache
+            cache = SolutionCache(maxsize=30, path=path)
+            solver = Solver("idastar", [8,6,4,2,1,3,5,0,7], cache=cache)
+            _ = solver.solve()
+            self.assertEqual(len(solver.statistics.moves), 25)
+            self.assertEqual(cache.stats()["disk_hits"], 1)
+            cache.close()
+
+    def test_server(self):
+        async def scenario():
+            service = server.SolveService(workers=1)
+            listener = await server.serve(service, port=0)
+            port = listener.sockets[0].getsockname()[1]
+            board = ",".join(map(str, self.puzzle_3_1))
+            requests = [{"id": i, "board": board, "method": "bfs"}
+                        for i in range(4)]
+            requests.append({"id": 4, "board": "1,0,2"})
+            requests.append({"id": 5, "board": board, "heuristic": ["x"]})
+            requests.append({"id": 6, "board": board, "zl": "yes"})
+            requests.append({"id": 7, "board": board, "zl": 5})
+            report = await loadgen.run(requests, concurrency=8, port=port)
+            listener.close()
+            await listener.wait_closed()
+            service.close()
+            return report, service.counters
+
+        report, counters = asyncio.run(scenario())
+        self.assertEqual(report["requests"], 8)
+        self.assertEqual(report["errors"], 4)
+        self.assertEqual(report["coalesced"], 3)
+        self.assertEqual(counters["searches"], 1)
+
+    def test_solvability(self):
+        # zero in an odd row of the 4x4 board
+        board = [1,2,3,4,5,6,7,8,9,10,11,12,13,14,0,15]
+        solver = Solver("ast", board, zl=True)
+        _ = solver.solve()
+        self.assertEqual(solver.statistics.moves, ['R'])
+        board[0], board[1] = board[1], board[0]
+        self.assertRaises(AttributeError, Solver, "ast", board, zl=True)
+
+    def test_benchmark(self):
+        baseline = list(benchmark.run(["3x3"], ["ast", "bibfs"], limit=3))
+        self.assertEqual(len(baseline), 6)
+        self.assertTrue(all(r["solved"] for r in baseline))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.csv")
+            benchmark.save(path, baseline)
+            self.assertEqual(benchmark.load(path), baseline)
+        current = [dict(r) for r in baseline]
+        self.assertEqual(benchmark.compare(baseline, current), [])
+        current[0]["nodes"] += 1
+        current[1]["solved"] = False
+        self.assertEqual(len(benchmark.compare(baseline, current)), 2)
+        # hdastar starts processes in the worker of the board
+        records = list(benchmark.run(["3x3"], ["hdastar"], limit=2))
+        self.assertEqual([r["cost"] for r in records], [4, 4])
+
 
 if __name__ == '__main__':
     unittest.main()